@@ -0,0 +1,89 @@
+import argparse
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Crawl-run records: which category pages of a run are already stored, so an interrupted run can resume
+
+RUNS_COLLECTION = "crawl_runs"
+PAGES_COLLECTION = "crawl_pages"
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def start_run(db, run_id=None, urls=None, num_pages=None):
+    # Creates the run record, or reopens it when resuming an existing run id
+    run_id = run_id or new_run_id()
+    db[RUNS_COLLECTION].update_one(
+        {'_id': run_id},
+        {
+            '$setOnInsert': {'started_at': datetime.now(), 'urls': urls, 'num_pages': num_pages},
+            '$set': {'status': 'running'},
+        },
+        upsert=True
+    )
+    return run_id
+
+
+def run_urls(db, run_id):
+    # Category URLs recorded when the run started (None for unknown runs)
+    run = db[RUNS_COLLECTION].find_one({'_id': run_id}, {'urls': 1})
+    return run.get('urls') if run else None
+
+
+def finish_run(db, run_id, status='finished'):
+    db[RUNS_COLLECTION].update_one({'_id': run_id}, {'$set': {'status': status, 'finished_at': datetime.now()}})
+
+
+def pages_done_for(db, run_id, url):
+    doc = db[PAGES_COLLECTION].find_one({'_id': f"{run_id}|{url}"}, {'pages_done': 1})
+    return set(doc['pages_done']) if doc else set()
+
+
+def mark_page_done(db, run_id, url, page):
+    db[PAGES_COLLECTION].update_one(
+        {'_id': f"{run_id}|{url}"},
+        {
+            '$setOnInsert': {'run_id': run_id, 'url': url},
+            '$addToSet': {'pages_done': page},
+            '$set': {'updated_at': datetime.now()},
+        },
+        upsert=True
+    )
+
+
+def missing_pages(db, run_id, urls, num_pages):
+    # Category/page pairs of the run that were never stored
+    done = {
+        doc['url']: set(doc['pages_done'])
+        for doc in db[PAGES_COLLECTION].find({'run_id': run_id}, {'url': 1, 'pages_done': 1})
+    }
+    return {
+        url: [page for page in range(num_pages) if page not in done.get(url, set())]
+        for url in urls
+        if len(done.get(url, set()) & set(range(num_pages))) < num_pages
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the progress of a crawl run')
+    parser.add_argument('run_id', nargs='?', help='Run to inspect (defaults to the latest)')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client["amazon-project"]
+    run = db[RUNS_COLLECTION].find_one({'_id': args.run_id}) if args.run_id else \
+        db[RUNS_COLLECTION].find_one(sort=[('started_at', -1)])
+    if run is None:
+        print('No crawl run found')
+    else:
+        print(f"Run {run['_id']}: {run['status']} (started {run['started_at']})")
+        if run.get('urls') and run.get('num_pages'):
+            for url, pages in missing_pages(db, run['_id'], run['urls'], run['num_pages']).items():
+                print(f"  Missing pages {[page + 1 for page in pages]} of {url}")
+    client.close()
@@ -0,0 +1,191 @@
+import argparse
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlsplit
+from lxml import html as lxml_html
+from parse_html import fetch_html
+
+# Category discovery: walks the best-seller navigation tree from the root, breadth first, and stores
+# every node in the categories collection. URLs are normalized (no ref= suffix, query or fragment) so
+# each node is fetched at most once per walk. On later walks, nodes expanded within refresh_days reuse
+# their stored children instead of being fetched again, and a node whose fetch fails falls back to its
+# stored children, so a transient error does not drop its subtree.
+
+ROOT_URL = "https://www.amazon.es/gp/bestsellers/"
+CATEGORIES_COLLECTION = "categories"
+REFRESH_DAYS = 7
+
+# Links of the best-seller browse tree (the left-hand navigation)
+NAV_LINK_XPATH = "//div[@role='tree']//a[@href]"
+BESTSELLERS_PATH = re.compile(r'^/gp/bestsellers(?:/(?P<department>[^/]+)(?:/(?P<node>\d+))?)?')
+
+
+def normalize_url(href, base=ROOT_URL):
+    # Canonical URL of a best-seller node, or None for links outside the best-seller tree
+    parts = urlsplit(urljoin(base, href))
+    match = BESTSELLERS_PATH.match(parts.path)
+    if not match or not match.group('department') or match.group('department').startswith('ref='):
+        return None
+    path = f"/gp/bestsellers/{match.group('department')}"
+    if match.group('node'):
+        path += f"/{match.group('node')}"
+    return f"https://{parts.netloc.lower()}{path}"
+
+
+def node_id(url):
+    # 'kitchen' or 'kitchen/2165363031'
+    return url.split('/gp/bestsellers/', 1)[1]
+
+
+def extract_nav_links(page_html, url):
+    # (normalized url, link text) of every node in the page's navigation tree
+    tree = lxml_html.fromstring(page_html)
+    links = {}
+    for link in tree.xpath(NAV_LINK_XPATH):
+        child_url = normalize_url(link.get('href'), url)
+        if child_url and child_url != url:
+            links.setdefault(child_url, link.text_content().strip())
+    return links
+
+
+def discover(fetch=fetch_html, root=ROOT_URL, max_depth=2, known=None, refresh_days=REFRESH_DAYS, concurrency=4):
+    # Breadth-first walk; known maps node ids to stored category documents (for incremental walks)
+    known = known or {}
+    fresh_after = datetime.now() - timedelta(days=refresh_days)
+    nodes = {}
+    seen = {root}
+    frontier = deque([(root, None, None, 0)])  # (url, name, parent node id, depth)
+    fetched = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while frontier:
+            # One level at a time, fetched in parallel
+            level = [frontier.popleft() for _ in range(len(frontier))]
+            to_fetch = []
+            for url, name, parent, depth in level:
+                node = node_id(url) if url != root else None
+                stored = known.get(node)
+                if node is not None:
+                    nodes[node] = {'url': url, 'name': name, 'parent': parent, 'depth': depth}
+                if depth >= max_depth:
+                    continue
+                if stored and stored.get('expanded_at') and stored['expanded_at'] >= fresh_after:
+                    # Expanded recently: reuse the stored children
+                    nodes[node]['children'] = stored.get('children', [])
+                    nodes[node]['expanded_at'] = stored['expanded_at']
+                    enqueue_children(frontier, seen, stored_children(known, node), node, depth)
+                else:
+                    to_fetch.append((url, node, depth))
+
+            pages = executor.map(lambda item: fetch_children(fetch, item[0]), to_fetch)
+            for (url, node, depth), children in zip(to_fetch, pages):
+                fetched += 1
+                if children is None:
+                    # Keep walking the stored subtree; the node keeps its stored children and expansion
+                    # time, so the next walk fetches it again
+                    children = stored_children(known, node)
+                    if children:
+                        print(f"Reusing {len(children)} stored children of {url}")
+                    enqueue_children(frontier, seen, children, node, depth)
+                    continue
+                # The page links ancestors and siblings too: only the nodes it enqueues are its children
+                enqueued = enqueue_children(frontier, seen, children, node, depth)
+                if node is not None:
+                    nodes[node]['children'] = [node_id(child) for child in enqueued]
+                    nodes[node]['expanded_at'] = datetime.now()
+            print(f"Depth {level[0][3]}: {len(level)} nodes, {len(to_fetch)} fetched")
+
+    print(f"{len(nodes)} categories discovered with {fetched} requests")
+    return nodes
+
+
+def stored_children(known, node):
+    # url -> name of the node's children in the stored tree (the departments for the root)
+    if node is None:
+        return {doc['url']: doc.get('name') for doc in known.values() if doc.get('depth') == 1}
+    stored = known.get(node) or {}
+    return {known[child]['url']: known[child].get('name') for child in stored.get('children', []) if child in known}
+
+
+def fetch_children(fetch, url):
+    try:
+        return extract_nav_links(fetch(url), url)
+    except Exception as e:
+        print(f"Failed to fetch {url}: {e}")
+        return None
+
+
+def enqueue_children(frontier, seen, children, parent, depth):
+    # Links to ancestors and siblings are in the tree too; the seen set keeps each node on the frontier once.
+    # Returns the links enqueued here, the nodes whose parent is this one
+    enqueued = []
+    for child_url, name in children.items():
+        if child_url not in seen:
+            seen.add(child_url)
+            frontier.append((child_url, name, parent, depth + 1))
+            enqueued.append(child_url)
+    return enqueued
+
+
+def store_tree(db, nodes, max_depth=None):
+    # Upserts the walked nodes; with max_depth, stored nodes within that depth that the walk
+    # did not reach any more are marked inactive
+    from pymongo import UpdateOne
+    now = datetime.now()
+    operations = []
+    for node, doc in nodes.items():
+        fields = {key: value for key, value in doc.items() if value is not None}
+        operations.append(UpdateOne(
+            {'_id': node},
+            {'$set': {**fields, 'last_seen': now, 'active': True}, '$setOnInsert': {'first_seen': now}},
+            upsert=True
+        ))
+    if operations:
+        db[CATEGORIES_COLLECTION].bulk_write(operations, ordered=False)
+    if max_depth is not None:
+        db[CATEGORIES_COLLECTION].update_many(
+            {'last_seen': {'$lt': now}, 'depth': {'$lte': max_depth}, 'active': True},
+            {'$set': {'active': False}}
+        )
+    return len(operations)
+
+
+def load_tree(db):
+    return {doc['_id']: doc for doc in db[CATEGORIES_COLLECTION].find({'active': True})}
+
+
+def crawl_urls(db, max_depth=None, leaves_only=False):
+    # Category URLs to feed the crawl, departments first
+    query = {'active': True}
+    if max_depth is not None:
+        query['depth'] = {'$lte': max_depth}
+    if leaves_only:
+        # Nodes the walks did not expand count as leaves as well
+        query['$or'] = [{'children': {'$size': 0}}, {'children': {'$exists': False}}]
+    return [doc['url'] for doc in db[CATEGORIES_COLLECTION].find(query, {'url': 1}).sort([('depth', 1), ('_id', 1)])]
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description='Discover best-seller categories and sub-categories')
+    parser.add_argument('--depth', type=int, default=2, help='Levels below the root to walk (1 = departments only)')
+    parser.add_argument('--refresh-days', type=float, default=REFRESH_DAYS,
+                        help='Reuse the stored children of nodes expanded more recently than this')
+    parser.add_argument('--full', action='store_true', help='Fetch every node again, ignoring the stored tree')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client["amazon-project"]
+    # --full still loads the stored tree, as the fallback for nodes whose fetch fails
+    nodes = discover(max_depth=args.depth, known=load_tree(db),
+                     refresh_days=0 if args.full else args.refresh_days, concurrency=args.concurrency)
+    print(f"{store_tree(db, nodes, args.depth)} categories stored")
+    client.close()
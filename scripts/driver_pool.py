@@ -0,0 +1,32 @@
+from scrape_all import build_driver
+
+# One long-lived headless Chrome per worker process, reused across links and recycled periodically
+
+
+class WorkerDriver:
+    def __init__(self, max_pages=50, headless=True):
+        self.max_pages = max_pages
+        self.headless = headless
+        self.driver = None
+        self.pages = 0
+
+    def get(self):
+        if self.driver is None or self.pages >= self.max_pages:
+            self.recycle()
+            self.driver = build_driver(headless=self.headless)
+        return self.driver
+
+    def record_pages(self, num_pages):
+        self.pages += num_pages
+
+    def recycle(self):
+        # Quit the current browser so the next get() starts a fresh one
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Error closing driver: {e}")
+        self.driver = None
+        self.pages = 0
+
+    close = recycle
@@ -0,0 +1,101 @@
+import argparse
+import os
+from datetime import datetime, time, timedelta
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Columnar snapshot of the raw records: one Parquet file per day under <out_dir>/date=YYYY-MM-DD/
+
+COLUMNS = ['datetime', 'category', 'rank', 'asin', 'title', 'price', 'rating', 'num_reviews', 'img_link']
+
+# Small numbers in narrow types. ASINs and categories stay plain strings: categoricals are written as dictionary
+# columns whose index width depends on each day's cardinality, and files that disagree cannot be read as one
+# dataset. Parquet dictionary-encodes the repeated values on disk anyway, and the dashboard categorizes them on load
+DTYPES = {
+    'rank': 'Int16',
+    'price': 'float32',
+    'rating': 'float32',
+    'num_reviews': 'Int32',
+}
+
+# Every partition is written with the same schema, even a day whose titles or images are all missing
+SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('ms')),
+    ('category', pa.string()),
+    ('rank', pa.int16()),
+    ('asin', pa.string()),
+    ('title', pa.string()),
+    ('price', pa.float32()),
+    ('rating', pa.float32()),
+    ('num_reviews', pa.int32()),
+    ('img_link', pa.string()),
+])
+
+
+def existing_partitions(out_dir):
+    if not os.path.isdir(out_dir):
+        return []
+    return sorted(name.split('=', 1)[1] for name in os.listdir(out_dir) if name.startswith('date='))
+
+
+def days_to_export(collection, out_dir):
+    # New days only, plus the last exported one since it may have been written while still in progress
+    exported = existing_partitions(out_dir)
+    first = collection.find_one({'datetime': {'$type': 'date'}}, {'datetime': 1}, sort=[('datetime', 1)])
+    last = collection.find_one({'datetime': {'$type': 'date'}}, {'datetime': 1}, sort=[('datetime', -1)])
+    if first is None:
+        return []
+    start = datetime.strptime(exported[-1], '%Y-%m-%d').date() if exported else first['datetime'].date()
+    end = last['datetime'].date()
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def to_frame(docs):
+    df = pd.DataFrame(docs, columns=COLUMNS)
+    df['datetime'] = pd.to_datetime(df['datetime']).astype('datetime64[ms]')
+    for column in ('price', 'rating', 'num_reviews', 'rank'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df.astype(DTYPES)
+
+
+def export_day(collection, out_dir, day):
+    start = datetime.combine(day, time.min)
+    docs = list(collection.find(
+        {'datetime': {'$gte': start, '$lt': start + timedelta(days=1)}},
+        {'_id': 0, **{column: 1 for column in COLUMNS}}
+    ))
+    if not docs:
+        return 0
+    partition_dir = os.path.join(out_dir, f'date={day:%Y-%m-%d}')
+    os.makedirs(partition_dir, exist_ok=True)
+    # Write to a temporary file first so readers never see a half-written partition
+    path = os.path.join(partition_dir, 'part.parquet')
+    to_frame(docs).to_parquet(path + '.tmp', engine='pyarrow', compression='zstd', index=False, schema=SCHEMA)
+    os.replace(path + '.tmp', path)
+    return len(docs)
+
+
+def export(collection, out_dir):
+    total = 0
+    for day in days_to_export(collection, out_dir):
+        count = export_day(collection, out_dir, day)
+        total += count
+        print(f'{day}: {count} records')
+    print(f'{total} records exported to {out_dir}')
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export scrape_collection as date-partitioned Parquet files')
+    parser.add_argument('out_dir')
+    parser.add_argument('--database', default='amazon-project')
+    parser.add_argument('--collection', default='scrape_collection')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    export(client[args.database][args.collection], args.out_dir)
+    client.close()
@@ -0,0 +1,129 @@
+import argparse
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from parse_html import extract_cards_html, build_page_records
+
+# Offline fixtures: capture best-seller HTML to disk, replay it through the parser and benchmark it
+
+FIXTURE_PATTERN = re.compile(r'^(?P<category>.+)__p(?P<page>\d+)__(?P<stamp>[\d-]+)\.html$')
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+# Values the extraction falls back to when a field is not found on a card
+MISSING_VALUES = {
+    'asin': (None, ''),
+    'title': (None, ''),
+    'price': (None,),
+    'rating': (None,),
+    'num_reviews': (None,),
+    'img_link': (None, ''),
+}
+
+
+def save_page_html(capture_dir, category_name, page, page_html):
+    os.makedirs(capture_dir, exist_ok=True)
+    stamp = datetime.now().strftime(STAMP_FORMAT)
+    path = os.path.join(capture_dir, f"{category_name}__p{page + 1}__{stamp}.html")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page_html)
+    return path
+
+
+def list_fixtures(fixture_dir):
+    fixtures = []
+    for name in sorted(os.listdir(fixture_dir)):
+        match = FIXTURE_PATTERN.match(name)
+        if match:
+            fixtures.append((os.path.join(fixture_dir, name), match.group('category'), int(match.group('page')) - 1))
+    return fixtures
+
+
+def capture_time(path):
+    # When the page was captured, from the stamp in its file name
+    return datetime.strptime(FIXTURE_PATTERN.match(os.path.basename(path)).group('stamp'), STAMP_FORMAT)
+
+
+def field_misses(cards):
+    misses = Counter()
+    for card in cards:
+        for field, missing in MISSING_VALUES.items():
+            if card.get(field) in missing:
+                misses[field] += 1
+    return misses
+
+
+def replay(fixture_dir):
+    # Parse every captured page as if it had just been scraped
+    data_list = []
+    for path, category_name, page in list_fixtures(fixture_dir):
+        with open(path, encoding='utf-8') as f:
+            page_data = build_page_records(extract_cards_html(f.read()), category_name, page, capture_time(path))
+        print(f'{os.path.basename(path)}: {len(page_data)} products')
+        data_list.extend(page_data)
+    return data_list
+
+
+def benchmark(fixture_dir, repeat=1, extract=extract_cards_html):
+    fixtures = list_fixtures(fixture_dir)
+    # Read the files up front so only the extraction is timed
+    pages = []
+    for path, category_name, page in fixtures:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+
+    records = 0
+    misses = Counter()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page_html in pages:
+            cards = extract(page_html)
+            records += len(cards)
+            misses.update(field_misses(cards))
+    elapsed = time.perf_counter() - start
+
+    num_pages = len(pages) * repeat
+    report = {
+        'pages': num_pages,
+        'records': records,
+        'seconds': elapsed,
+        'pages_per_sec': num_pages / elapsed if elapsed > 0 else 0,
+        'records_per_sec': records / elapsed if elapsed > 0 else 0,
+        'field_misses': {field: misses.get(field, 0) for field in MISSING_VALUES},
+    }
+    return report
+
+
+def print_report(report):
+    print(f"Pages: {report['pages']}  Records: {report['records']}  Time: {report['seconds']:.3f}s")
+    print(f"{report['pages_per_sec']:.1f} pages/sec  {report['records_per_sec']:.1f} records/sec")
+    print('Field extraction failures:')
+    for field, count in report['field_misses'].items():
+        print(f'  {field}: {count}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay and benchmark captured best-seller pages')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = subparsers.add_parser('replay', help='Parse captured pages and optionally store them')
+    replay_parser.add_argument('fixture_dir')
+    replay_parser.add_argument('--insert', action='store_true', help='Insert the parsed records into MongoDB')
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='Measure parser throughput over captured pages')
+    benchmark_parser.add_argument('fixture_dir')
+    benchmark_parser.add_argument('--repeat', type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        data_list = replay(args.fixture_dir)
+        print(f'{len(data_list)} products replayed')
+        if args.insert:
+            from dotenv import load_dotenv
+            from scrape_all import insert_into_mongodb
+            load_dotenv()
+            insert_into_mongodb(data_list, os.getenv("MONGO_URI"), "amazon-project", "scrape_collection")
+    else:
+        print_report(benchmark(args.fixture_dir, args.repeat))
@@ -0,0 +1,255 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from crawl_runs import start_run, finish_run
+
+# Crawl job queue in MongoDB, shared by scraper workers on any number of hosts: one job per category
+# of a run, claimed atomically with a lease. A worker that dies stops renewing its lease, and the job is
+# claimed again once the lease expires. Pages are still checkpointed per run (see crawl_runs.py), so a
+# retried job only scrapes the pages the previous attempt did not store.
+
+JOBS_COLLECTION = "crawl_jobs"
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 10  # Wait between claims while other workers still hold leases
+
+
+def job_id(run_id, url):
+    return f"{run_id}|{url}"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue(db, run_id, urls, num_pages, max_attempts=MAX_ATTEMPTS):
+    # Idempotent: jobs that already exist (for example when re-enqueuing a run) are left as they are
+    now = datetime.now()
+    operations = [
+        UpdateOne(
+            {'_id': job_id(run_id, url)},
+            {'$setOnInsert': {
+                'run_id': run_id,
+                'url': url,
+                'num_pages': num_pages,
+                'status': 'queued',
+                'attempts': 0,
+                'max_attempts': max_attempts,
+                'lease_expires': None,
+                'worker': None,
+                'created_at': now,
+            }},
+            upsert=True
+        )
+        for url in dict.fromkeys(urls)
+    ]
+    if not operations:
+        return 0
+    return db[JOBS_COLLECTION].bulk_write(operations, ordered=False).upserted_count
+
+
+def claimable(now, run_id=None):
+    # Queued jobs, and leased jobs whose worker stopped renewing, that still have attempts left
+    query = {
+        '$or': [
+            {'status': 'queued'},
+            {'status': 'leased', 'lease_expires': {'$lt': now}},
+        ],
+        '$expr': {'$lt': ['$attempts', '$max_attempts']},
+    }
+    if run_id:
+        query['run_id'] = run_id
+    return query
+
+
+def claim(db, worker_id, lease_seconds=LEASE_SECONDS, run_id=None):
+    # find_one_and_update is atomic, so two workers can never lease the same job
+    now = datetime.now()
+    return db[JOBS_COLLECTION].find_one_and_update(
+        claimable(now, run_id),
+        {
+            '$set': {
+                'status': 'leased',
+                'worker': worker_id,
+                'leased_at': now,
+                'lease_expires': now + timedelta(seconds=lease_seconds),
+            },
+            '$inc': {'attempts': 1},
+        },
+        sort=[('attempts', 1), ('created_at', 1)],  # Fresh jobs before retries
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def renew(db, job, worker_id, lease_seconds=LEASE_SECONDS):
+    # False when the lease was lost (it expired and another worker claimed the job)
+    result = db[JOBS_COLLECTION].update_one(
+        {'_id': job['_id'], 'status': 'leased', 'worker': worker_id},
+        {'$set': {'lease_expires': datetime.now() + timedelta(seconds=lease_seconds)}}
+    )
+    return result.modified_count == 1
+
+
+def complete(db, job, worker_id):
+    db[JOBS_COLLECTION].update_one(
+        {'_id': job['_id'], 'worker': worker_id},
+        {'$set': {'status': 'done', 'lease_expires': None, 'finished_at': datetime.now()}}
+    )
+
+
+def fail(db, job, worker_id, error):
+    # Back to the queue while attempts are left, otherwise failed for good
+    status = 'queued' if job['attempts'] < job['max_attempts'] else 'failed'
+    db[JOBS_COLLECTION].update_one(
+        {'_id': job['_id'], 'worker': worker_id},
+        {'$set': {'status': status, 'lease_expires': None, 'last_error': str(error), 'updated_at': datetime.now()}}
+    )
+    return status
+
+
+def expire_exhausted(db, run_id=None):
+    # Jobs whose last attempt's worker died cannot be claimed again; mark them failed
+    query = {'status': 'leased', 'lease_expires': {'$lt': datetime.now()}, '$expr': {'$gte': ['$attempts', '$max_attempts']}}
+    if run_id:
+        query['run_id'] = run_id
+    return db[JOBS_COLLECTION].update_many(query, {'$set': {'status': 'failed', 'last_error': 'lease expired'}}).modified_count
+
+
+def queue_counts(db, run_id=None):
+    match = {'run_id': run_id} if run_id else {}
+    counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+    for doc in db[JOBS_COLLECTION].aggregate([{'$match': match}, {'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+        counts[doc['_id']] = doc['count']
+    return counts
+
+
+def keep_leased(db, job, worker_id, lease_seconds, stop):
+    # Heartbeat: renew the lease at a third of its length while the job runs
+    while not stop.wait(lease_seconds / 3):
+        if not renew(db, job, worker_id, lease_seconds):
+            print(f"Lost the lease on {job['url']}")
+            return
+
+
+def work(db, scrape, worker_id=None, lease_seconds=LEASE_SECONDS, run_id=None, poll=POLL_SECONDS):
+    # Pulls jobs until none are queued or leased; scrape(url, num_pages, run_id) returns the pages stored
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while True:
+        job = claim(db, worker_id, lease_seconds, run_id)
+        if job is None:
+            expire_exhausted(db, run_id)
+            counts = queue_counts(db, run_id)
+            if not counts['queued'] and not counts['leased']:
+                return processed
+            # Other workers still hold leases that may expire and come back to the queue
+            time.sleep(poll)
+            continue
+
+        print(f"[{worker_id}] {job['url']} (attempt {job['attempts']}/{job['max_attempts']})")
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=keep_leased, args=(db, job, worker_id, lease_seconds, stop), daemon=True)
+        heartbeat.start()
+        pages_done = None
+        try:
+            pages_done = scrape(job['url'], job['num_pages'], job['run_id'])
+            error = f"partial scrape: {pages_done}/{job['num_pages']} pages"
+        except Exception as e:
+            error = e
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if pages_done is not None and pages_done >= job['num_pages']:
+            complete(db, job, worker_id)
+        else:
+            print(f"[{worker_id}] {job['url']} {fail(db, job, worker_id, error)}: {error}")
+        processed += 1
+
+
+def make_job_scraper(engine, mongo_uri, database_name, collection_name, metrics=None, capture_dir=None):
+    if engine == 'http':
+        from parse_html import scrape_amazon_url_http
+        return lambda url, num_pages, run_id: scrape_amazon_url_http(
+            url, num_pages, mongo_uri, database_name, collection_name, run_id=run_id, metrics=metrics, capture_dir=capture_dir)
+
+    # One long-lived browser per worker, as in multiscrape_all.py
+    from driver_pool import WorkerDriver
+    from scrape_all import scrape_amazon_url
+    worker_driver = WorkerDriver()
+
+    def scrape(url, num_pages, run_id):
+        try:
+            pages_done = scrape_amazon_url(url, num_pages, mongo_uri, database_name, collection_name,
+                                           driver=worker_driver.get(), run_id=run_id, metrics=metrics,
+                                           capture_dir=capture_dir)
+        except Exception:
+            worker_driver.recycle()
+            raise
+        worker_driver.record_pages(pages_done)
+        return pages_done
+    scrape.close = worker_driver.close
+    return scrape
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed crawl: enqueue a run, or pull its jobs as a worker')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Create a run and queue one job per category')
+    enqueue_parser.add_argument('--pages', type=int, default=2)
+    enqueue_parser.add_argument('--attempts', type=int, default=MAX_ATTEMPTS)
+    enqueue_parser.add_argument('--run', metavar='RUN_ID', help='Add the jobs to this run instead of a new one')
+    enqueue_parser.add_argument('--discovered', action='store_true',
+                                help='Queue the categories stored by discover.py instead of the built-in list')
+    enqueue_parser.add_argument('--depth', type=int, default=None, help='With --discovered, deepest category level to queue')
+
+    work_parser = subparsers.add_parser('work', help='Scrape queued jobs until the queue is empty')
+    work_parser.add_argument('--engine', choices=['http', 'chrome'], default='chrome')
+    work_parser.add_argument('--run', metavar='RUN_ID', help='Only take jobs of this run')
+    work_parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help='Lease length in seconds')
+    work_parser.add_argument('--worker-id', default=None)
+    work_parser.add_argument('--metrics-log', default=None, help='JSON-lines file for per-page stage timings')
+    work_parser.add_argument('--capture', metavar='DIR', default=None,
+                             help='Also save every page\'s HTML here, as fixtures for fixtures.py replay/benchmark')
+
+    status_parser = subparsers.add_parser('status', help='Count the jobs of a run by status')
+    status_parser.add_argument('--run', metavar='RUN_ID')
+
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file (MONGO_URI may point at a local mongod for testing)
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI")
+    client = MongoClient(mongo_uri)
+    db = client["amazon-project"]
+
+    if args.command == 'enqueue':
+        if args.discovered:
+            from discover import crawl_urls
+            urls = crawl_urls(db, args.depth)
+        else:
+            from multiscrape_all import links as urls
+        run_id = start_run(db, args.run, urls, args.pages)
+        print(f"Crawl run {run_id}: {enqueue(db, run_id, urls, args.pages, args.attempts)} jobs queued")
+    elif args.command == 'work':
+        from metrics import CrawlMetrics
+        metrics = CrawlMetrics(args.metrics_log, args.run)
+        scrape = make_job_scraper(args.engine, mongo_uri, "amazon-project", "scrape_collection", metrics, args.capture)
+        try:
+            processed = work(db, scrape, args.worker_id, args.lease, args.run)
+        finally:
+            if hasattr(scrape, 'close'):
+                scrape.close()
+        print(f"Queue empty after {processed} jobs")
+        if args.run:
+            counts = queue_counts(db, args.run)
+            finish_run(db, args.run, 'finished' if not counts['failed'] else 'incomplete')
+    else:
+        print(queue_counts(db, args.run))
+    client.close()
@@ -0,0 +1,174 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Crawl instrumentation: per-stage timings and counters for every category and page, appended to a
+# JSON-lines log (one object per line, so several worker processes can share the file) and summarized
+# at the end of the run. Stages named in profile_stages also run under cProfile.
+
+METRICS_LOG = "crawl_metrics.jsonl"
+
+
+class Span:
+    # Timings and counters of one unit of work: a category ('category') or one of its pages ('page')
+    def __init__(self, collector, kind, **labels):
+        self.collector = collector
+        self.kind = kind
+        self.labels = labels
+        self.timings = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        profiler = self.collector.start_profile(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+            self.collector.stop_profile(name, profiler)
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            **self.labels,
+            'elapsed': round(time.perf_counter() - self.started, 4),
+            'timings': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+            'counts': dict(self.counts),
+        }
+
+    def finish(self):
+        self.collector.record(self.as_dict())
+
+
+class CrawlMetrics:
+    # Collects the spans of one process; with no log_path they are only kept in memory
+    def __init__(self, log_path=None, run_id=None, profile_stages=()):
+        self.log_path = log_path
+        self.run_id = run_id
+        self.profile_stages = set(profile_stages)
+        self.profiles = {}
+        self.records = []
+        self.lock = threading.Lock()
+
+    def span(self, kind, **labels):
+        if self.run_id:
+            labels.setdefault('run_id', self.run_id)
+        return Span(self, kind, **labels)
+
+    def record(self, entry):
+        with self.lock:
+            self.records.append(entry)
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, default=str) + '\n')
+
+    def start_profile(self, stage):
+        if stage not in self.profile_stages:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread (nested profiled stages)
+            return None
+        return profiler
+
+    def stop_profile(self, stage, profiler):
+        if profiler is None:
+            return
+        profiler.disable()
+        with self.lock:
+            if stage in self.profiles:
+                self.profiles[stage].add(profiler)
+            else:
+                self.profiles[stage] = pstats.Stats(profiler)
+
+    def dump_profiles(self, prefix=None):
+        # One .prof file per profiled stage (and process), readable with pstats or snakeviz
+        prefix = prefix or self.log_path or 'crawl'
+        paths = []
+        for stage, stats in self.profiles.items():
+            path = f"{prefix}.{stage}.{os.getpid()}.prof"
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+def load_log(log_path, run_id=None):
+    records = []
+    with open(log_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if run_id is None or entry.get('run_id') == run_id:
+                    records.append(entry)
+    return records
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(records):
+    pages = [entry for entry in records if entry['kind'] == 'page']
+    categories = [entry for entry in records if entry['kind'] == 'category']
+    stage_times = defaultdict(list)
+    counts = defaultdict(int)
+    for entry in records:
+        for stage, seconds in entry['timings'].items():
+            stage_times[stage].append(seconds)
+        for name, value in entry['counts'].items():
+            counts[name] += value
+
+    total = sum(sum(times) for times in stage_times.values())
+    stages = {
+        stage: {
+            'total': sum(times),
+            'mean': sum(times) / len(times),
+            'p95': percentile(times, 0.95),
+            'share': sum(times) / total if total else 0,
+        }
+        for stage, times in sorted(stage_times.items(), key=lambda item: -sum(item[1]))
+    }
+    return {
+        'categories': len(categories),
+        'pages': len(pages),
+        'elapsed': sum(entry['elapsed'] for entry in categories) or sum(entry['elapsed'] for entry in pages),
+        'stages': stages,
+        'counts': dict(counts),
+    }
+
+
+def print_report(summary):
+    print(f"Categories: {summary['categories']}  Pages: {summary['pages']}  Time: {summary['elapsed']:.1f}s")
+    print(f"{'stage':<24}{'total s':>10}{'mean s':>10}{'p95 s':>10}{'share':>8}")
+    for stage, times in summary['stages'].items():
+        print(f"{stage:<24}{times['total']:>10.2f}{times['mean']:>10.3f}{times['p95']:>10.3f}{times['share']:>8.0%}")
+    for name, value in sorted(summary['counts'].items()):
+        print(f"  {name}: {value}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the crawl metrics log')
+    parser.add_argument('log_path', nargs='?', default=METRICS_LOG)
+    parser.add_argument('--run', metavar='RUN_ID', help='Only the spans of this crawl run')
+    args = parser.parse_args()
+
+    print_report(summarize(load_log(args.log_path, args.run)))
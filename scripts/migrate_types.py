@@ -0,0 +1,62 @@
+import argparse
+import os
+import time
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from records import normalize_record, RecordError, FIELDS
+
+# One-off migration: rewrites stored products with the typed schema (BSON dates, floats, nulls)
+
+# Documents written before the typed schema: string dates or prices, 0 placeholders, float review counts
+UNTYPED_QUERY = {'$or': [
+    {'datetime': {'$type': 'string'}},
+    {'price': {'$type': 'string'}},
+    {'rating': {'$in': [0, '0']}},
+    {'num_reviews': {'$type': ['double', 'string']}},
+    {'num_reviews': 0},
+]}
+
+
+def migrate(collection, batch_size=1000, dry_run=False):
+    converted = 0
+    invalid = 0
+    start = time.perf_counter()
+    operations = []
+
+    for doc in collection.find(UNTYPED_QUERY, {field: 1 for field in FIELDS}).batch_size(batch_size):
+        try:
+            record = normalize_record(doc)
+        except RecordError as e:
+            invalid += 1
+            print(f"Skipping {doc['_id']}: {e}")
+            continue
+        operations.append(UpdateOne({'_id': doc['_id']}, {'$set': record}))
+        if len(operations) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            converted += len(operations)
+            operations = []
+            print(f'{converted} documents converted')
+
+    if operations and not dry_run:
+        collection.bulk_write(operations, ordered=False)
+    converted += len(operations)
+
+    elapsed = time.perf_counter() - start
+    print(f"{'Would convert' if dry_run else 'Converted'} {converted} documents ({invalid} invalid) in {elapsed:.1f}s")
+    return converted, invalid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert stored products to the typed record schema')
+    parser.add_argument('--database', default='amazon-project')
+    parser.add_argument('--collection', default='scrape_collection')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    migrate(client[args.database][args.collection], args.batch_size, args.dry_run)
+    client.close()
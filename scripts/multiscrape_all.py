@@ -5,8 +5,15 @@ from selenium.webdriver.common.by import By
 import csv
 import re
 import multiprocessing
+import multiprocessing.util
+import argparse
 #from scrape_links import links
 from scrape_all import scrape_amazon_url
+from driver_pool import WorkerDriver
+from crawl_runs import start_run, finish_run, missing_pages, run_urls
+from discover import crawl_urls
+from metrics import CrawlMetrics, METRICS_LOG, load_log, summarize, print_report
+from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 
@@ -14,23 +21,94 @@ links = ['https://www.amazon.es/gp/bestsellers/grocery/ref=zg_bs_nav_grocery_0',
 
 
 
-# Function to scrape a single link
-def scrape_single_link(link):
+NUM_PAGES = 2  # Replace with the number of pages you want to scrape
+
+# Per-process state, set up once by init_worker
+worker_driver = None
+worker_metrics = None
+mongo_uri = None
+crawl_run_id = None
+crawl_num_pages = NUM_PAGES
+capture_dir = None
+
+
+def init_worker(run_id=None, max_pages_per_driver=50, metrics_log=METRICS_LOG, profile_stages=(), num_pages=NUM_PAGES,
+                capture=None):
+    global worker_driver, worker_metrics, mongo_uri, crawl_run_id, crawl_num_pages, capture_dir
+    crawl_run_id = run_id
+    crawl_num_pages = num_pages
+    capture_dir = capture
     # Load environment variables from the .env file
     load_dotenv()
     mongo_uri = os.getenv("MONGO_URI")
+    worker_driver = WorkerDriver(max_pages=max_pages_per_driver)
+    # Every worker appends its spans to the shared log; the parent summarizes it at the end
+    worker_metrics = CrawlMetrics(metrics_log, run_id, profile_stages)
+    # Quit the browser when the pool shuts this worker down
+    multiprocessing.util.Finalize(None, worker_driver.close, exitpriority=10)
+    multiprocessing.util.Finalize(None, worker_metrics.dump_profiles, exitpriority=10)
+
+
+# Function to scrape a single link
+def scrape_single_link(link):
+    if worker_driver is None:
+        init_worker()
     database_name = "amazon-project"
     collection_name = "scrape_collection"
-    num_pages = 2  # Replace with the number of pages you want to scrape
+    num_pages = crawl_num_pages
     try:
-        scrape_amazon_url(link, num_pages, mongo_uri, database_name, collection_name)
+        # Only slow when the worker starts or recycles its browser
+        span = worker_metrics.span('driver', url=link)
+        with span.stage('driver_start'):
+            driver = worker_driver.get()
+        span.finish()
+        pages_done = scrape_amazon_url(link, num_pages, mongo_uri, database_name, collection_name,
+                                       driver=driver, run_id=crawl_run_id, metrics=worker_metrics, capture_dir=capture_dir)
+        worker_driver.record_pages(pages_done)
     except Exception as e:
         print(f"Error scraping {link}: {str(e)}")
+        # Start the next link with a fresh browser in case this one crashed
+        worker_driver.recycle()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape every best-seller category in parallel')
+    parser.add_argument('--resume', metavar='RUN_ID', help='Resume an interrupted run, scraping only its missing pages')
+    parser.add_argument('--pages', type=int, default=NUM_PAGES, help='Pages to scrape per category')
+    parser.add_argument('--discovered', action='store_true',
+                        help='Crawl the categories stored by discover.py instead of the built-in list')
+    parser.add_argument('--depth', type=int, default=None, help='With --discovered, deepest category level to crawl')
+    parser.add_argument('--metrics-log', default=METRICS_LOG, help='JSON-lines file for per-page stage timings')
+    parser.add_argument('--profile', metavar='STAGE', action='append', default=[],
+                        help='Run this stage (e.g. extract, write) under cProfile in every worker; repeatable')
+    parser.add_argument('--capture', metavar='DIR', default=None,
+                        help='Also save every page\'s HTML here, as fixtures for fixtures.py replay/benchmark')
+    args = parser.parse_args()
+
     # Number of processes to create (you can adjust this as needed)
     num_processes = 8
 
+    # Record the run so it can be resumed if interrupted
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client["amazon-project"]
+    # A resumed run keeps the categories it started with
+    urls = (args.resume and run_urls(db, args.resume)) or (crawl_urls(db, args.depth) if args.discovered else links)
+    run_id = start_run(db, args.resume, urls, args.pages)
+    print(f"Crawl run {run_id}")
+
     # Create a multiprocessing pool to run the scraping function in parallel
-    with multiprocessing.Pool(num_processes) as pool:
-        pool.map(scrape_single_link, links)
\ No newline at end of file
+    pool = multiprocessing.Pool(num_processes, initializer=init_worker,
+                                initargs=(run_id, 50, args.metrics_log, args.profile, args.pages, args.capture))
+    try:
+        pool.map(scrape_single_link, urls)
+    finally:
+        # close/join (instead of terminate) lets each worker quit its browser
+        pool.close()
+        pool.join()
+
+    still_missing = missing_pages(db, run_id, urls, args.pages)
+    finish_run(db, run_id, 'finished' if not still_missing else 'incomplete')
+    if still_missing:
+        print(f"{len(still_missing)} categories incomplete, rerun with --resume {run_id}")
+    client.close()
+    print_report(summarize(load_log(args.metrics_log, run_id)))
@@ -0,0 +1,188 @@
+import re
+import time
+from datetime import datetime
+import requests
+from lxml import html as lxml_html
+from records import normalize_records
+
+# Browser-free engine: parses best-seller pages from raw HTML instead of a live Chrome
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'es-ES,es;q=0.9',
+}
+
+PRODUCTS_PER_PAGE = 50
+
+
+def class_xpath(class_name):
+    # XPath test for one class among several in the class attribute
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+CARD_XPATH = f"//div[{class_xpath('a-cardui')} and {class_xpath('p13n-grid-content')}]"
+ASIN_XPATH = ".//div[@data-asin]/@data-asin"
+IMAGE_XPATH = f".//a[{class_xpath('a-link-normal')}]/div[{class_xpath('a-section')}]/img[{class_xpath('a-dynamic-image')}]"
+PRICE_XPATH = f".//*[{class_xpath('a-size-base')} and {class_xpath('a-color-price')}]//*[{class_xpath('_cDEzb_p13n-sc-price_3mJ9Z')}]"
+RATING_XPATH = f".//i[{class_xpath('a-icon-star-small')}]//span[{class_xpath('a-icon-alt')}]"
+REVIEWS_XPATH = f".//a[@class='a-link-normal']//span[{class_xpath('a-size-small')}]"
+NEXT_PAGE_XPATH = f"//li[{class_xpath('a-last')}]/a[@href]"
+
+
+# Clean the price text (remove currency symbol and replace comma with dot), None when missing
+def parse_price(price_text):
+    try:
+        return float(price_text.replace('€', '').replace(',', '.').strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_rating(rating_text):
+    if not rating_text or not rating_text.strip():
+        return None
+    try:
+        return float(rating_text.split(" de ")[0].replace(',', '.').strip())
+    except ValueError:
+        return None
+
+
+def parse_num_reviews(reviews_text):
+    try:
+        return int(str(reviews_text).replace('.', '').strip())
+    except ValueError:
+        return None
+
+
+# Extract the category name from the URL: the department, plus the node id for sub-categories
+# (e.g. 'kitchen' for /gp/bestsellers/kitchen/ref=... and 'kitchen-2165363031' for /gp/bestsellers/kitchen/2165363031)
+def category_from_url(url):
+    match = re.search(r'/bestsellers/([^/?#]+)(?:/(\d+))?', url)
+    return f"{match.group(1)}-{match.group(2)}" if match.group(2) else match.group(1)
+
+
+# Create a list of typed records for the page's data, including 'datetime' (now, unless the page was scraped earlier)
+def build_page_records(cards, category_name, page, scraped_at=None):
+    scraped_at = (scraped_at or datetime.now()).replace(microsecond=0)
+    records, errors = normalize_records(
+        {
+            'datetime': scraped_at,
+            'category': category_name,
+            'rank': rank + (page * PRODUCTS_PER_PAGE),  # Adjust rank for each page
+            **card
+        }
+        for rank, card in enumerate(cards, start=1)
+    )
+    for error in errors:
+        print(f"Skipping product on page {page + 1} of {category_name}: {error}")
+    return records
+
+
+def first_or_none(values):
+    return values[0] if values else None
+
+
+def extract_cards_html(page_html):
+    # Same fields as the in-browser extraction, read from static markup
+    tree = lxml_html.fromstring(page_html)
+    cards = []
+    for card in tree.xpath(CARD_XPATH):
+        image = first_or_none(card.xpath(IMAGE_XPATH))
+        price = first_or_none(card.xpath(PRICE_XPATH))
+        rating = first_or_none(card.xpath(RATING_XPATH))
+        reviews = first_or_none(card.xpath(REVIEWS_XPATH))
+        cards.append({
+            'asin': first_or_none(card.xpath(ASIN_XPATH)),
+            'title': image.get('alt') if image is not None else None,
+            'price': parse_price(price.text_content()) if price is not None else None,
+            'rating': parse_rating(rating.text_content()) if rating is not None else None,
+            'num_reviews': parse_num_reviews(reviews.text_content()) if reviews is not None else None,
+            'img_link': image.get('src') if image is not None else None
+        })
+    return cards
+
+
+def is_last_page(page_html):
+    # The final page of a listing has no "next page" link; a page without pagination counts as the final one
+    return not lxml_html.fromstring(page_html).xpath(NEXT_PAGE_XPATH)
+
+
+def parse_bestseller_html(page_html, category_name, page=0):
+    return build_page_records(extract_cards_html(page_html), category_name, page)
+
+
+def parse_html_file(path, category_name, page=0):
+    with open(path, encoding='utf-8') as f:
+        return parse_bestseller_html(f.read(), category_name, page)
+
+
+def fetch_html(url, session=None, timeout=20):
+    session = session or requests.Session()
+    response = session.get(url, headers=HEADERS, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+# Best-seller pages after the first one are served with the pg query parameter
+def page_url(url, page):
+    if page == 0:
+        return url
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}pg={page + 1}"
+
+
+def scrape_amazon_url_http(url, num_pages, mongo_uri, database_name, collection_name, fetcher=fetch_html, capture_dir=None, delay=1, run_id=None, metrics=None,
+                           quarantine_dir=None):
+    # Imported here so the parser can be used on saved HTML without the MongoDB dependencies
+    from pymongo import MongoClient
+    from storage import process_page
+    from crawl_runs import pages_done_for
+    from fixtures import save_page_html
+    from metrics import CrawlMetrics
+    from quarantine import QUARANTINE_DIR
+
+    quarantine_dir = quarantine_dir or QUARANTINE_DIR
+
+    # Per-stage timings and counters (kept in memory only unless the caller passes a logging collector)
+    metrics = metrics or CrawlMetrics()
+
+    # One connection for the whole category: every page is written as soon as it is extracted
+    client = MongoClient(mongo_uri)
+    db = client[database_name]
+    collection = db[collection_name]
+
+    try:
+        # Pages already stored by this run are skipped when resuming
+        done = pages_done_for(db, run_id, url) if run_id else set()
+
+        category_name = category_from_url(url)
+        category_span = metrics.span('category', category=category_name, engine='http')
+        for page in range(num_pages):
+            if page in done:
+                continue
+            print(f'Scraping {category_name} Top 100 ----------------------------------------- page: {page + 1}')
+            page_span = metrics.span('page', category=category_name, page=page + 1, engine='http')
+            try:
+                with page_span.stage('navigate'):
+                    page_html = fetcher(page_url(url, page))
+            except Exception as e:
+                print(f"Failed to fetch page {page + 1} of {category_name}: {e}")
+                page_span.count('navigation_failures')
+                page_span.finish()
+                break
+            if capture_dir:
+                with page_span.stage('capture'):
+                    save_page_html(capture_dir, category_name, page, page_html)
+            with page_span.stage('extract'):
+                cards = extract_cards_html(page_html)
+            if process_page(collection, cards, lambda: page_html, category_name, url, page, page_span, run_id, quarantine_dir):
+                done.add(page)
+            page_span.finish()
+            time.sleep(delay)  # Be gentle between requests
+    finally:
+        # Close MongoDB connection, also when a page raises
+        client.close()
+
+    category_span.count('pages', len(done & set(range(num_pages))))
+    category_span.finish()
+    return len(done & set(range(num_pages)))
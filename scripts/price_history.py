@@ -0,0 +1,122 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient, ASCENDING
+
+# Change-only history: an observation is stored for an ASIN only when one of the tracked values changed.
+# Rank and category come from the category listing, so the last state is kept per (ASIN, category): a product
+# listed in several categories is compared with its previous sighting in the same category
+
+HISTORY_COLLECTION = "price_history"
+TRACKED_FIELDS = ('price', 'rating', 'num_reviews', 'rank')
+
+
+def observation(record):
+    return {
+        'asin': record['asin'],
+        'datetime': record['datetime'],
+        'category': record['category'],
+        **{field: record.get(field) for field in TRACKED_FIELDS},
+    }
+
+
+def state_key(record):
+    return record['asin'], record['category']
+
+
+def changed_observations(records, last_states):
+    # last_states maps (ASIN, category) -> its last stored tracked values and is advanced as records are compared
+    changes = []
+    for record in sorted(records, key=lambda record: record['datetime']):
+        last = last_states.get(state_key(record))
+        if last is not None and last.get('datetime') is not None and record['datetime'] < last['datetime']:
+            continue  # Older than what is already stored
+        if last is None or any(record.get(field) != last.get(field) for field in TRACKED_FIELDS):
+            changes.append(observation(record))
+        last_states[state_key(record)] = {'datetime': record['datetime'], **{field: record.get(field) for field in TRACKED_FIELDS}}
+    return changes
+
+
+def last_states_for(db, asins):
+    # Latest stored observation of every (ASIN, category) pair of the given ASINs (uses the asin_datetime index)
+    docs = db[HISTORY_COLLECTION].aggregate([
+        {'$match': {'asin': {'$in': asins}}},
+        {'$sort': {'asin': ASCENDING, 'datetime': ASCENDING}},
+        {'$group': {
+            '_id': {'asin': '$asin', 'category': '$category'},
+            'datetime': {'$last': '$datetime'},
+            **{field: {'$last': f'${field}'} for field in TRACKED_FIELDS},
+        }},
+    ])
+    return {(doc['_id']['asin'], doc['_id']['category']): {key: doc[key] for key in ('datetime',) + TRACKED_FIELDS} for doc in docs}
+
+
+def record_changes(db, records):
+    # Compares the records with the last stored observation of each ASIN in the same category
+    last_states = last_states_for(db, list({record['asin'] for record in records}))
+    changes = changed_observations(records, last_states)
+    if changes:
+        db[HISTORY_COLLECTION].insert_many(changes, ordered=False)
+    return len(changes)
+
+
+def stored_days(collection, match=None):
+    day = {'$dateToString': {'format': '%Y-%m-%d', 'date': '$datetime'}}
+    return {doc['_id'] for doc in collection.aggregate([
+        {'$match': match or {}},
+        {'$group': {'_id': day}},
+    ], allowDiskUse=True)}
+
+
+def days_without_records(db, collection_name="scrape_collection"):
+    # Days of history with no raw record to rebuild them from (scraped with HISTORY_MODE=compact)
+    raw_days = stored_days(db[collection_name], {'datetime': {'$type': 'date'}})
+    return sorted(stored_days(db[HISTORY_COLLECTION]) - raw_days)
+
+
+def backfill(db, collection_name="scrape_collection", batch_size=1000, force=False):
+    # Rebuilds the history from the raw records, walking each ASIN in time order (uses the asin_datetime index).
+    # The rebuild replaces the whole history, so it refuses to run when some of it only exists in the history
+    missing = [] if force else days_without_records(db, collection_name)
+    if missing:
+        print(f"Not rebuilding: {len(missing)} days of history ({missing[0]} to {missing[-1]}) have no raw records "
+              f"(HISTORY_MODE=compact) and would be lost. Pass --force to rebuild anyway")
+        return None
+    db[HISTORY_COLLECTION].delete_many({})
+    last_states = {}
+    batch = []
+    stored = 0
+    cursor = db[collection_name].find(
+        {'datetime': {'$type': 'date'}},
+        {'_id': 0, 'asin': 1, 'datetime': 1, 'category': 1, **{field: 1 for field in TRACKED_FIELDS}}
+    ).sort([('asin', ASCENDING), ('datetime', ASCENDING)])
+    for record in cursor:
+        batch.extend(changed_observations([record], last_states))
+        if len(batch) >= batch_size:
+            db[HISTORY_COLLECTION].insert_many(batch, ordered=False)
+            stored += len(batch)
+            batch = []
+            # Only the current ASIN's categories are still needed
+            last_states = {key: state for key, state in last_states.items() if key[0] == record['asin']}
+    if batch:
+        db[HISTORY_COLLECTION].insert_many(batch, ordered=False)
+        stored += len(batch)
+    print(f"{stored} observations stored")
+    return stored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the change-only price history from the raw records')
+    parser.add_argument('--database', default='amazon-project')
+    parser.add_argument('--collection', default='scrape_collection')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild even if days of history have no raw records (they are deleted)')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    stored = backfill(client[args.database], args.collection, force=args.force)
+    client.close()
+    if stored is None:
+        raise SystemExit(1)
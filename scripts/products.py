@@ -0,0 +1,87 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+# Latest state per ASIN: current price/rating/reviews/rank, first and last sighting and every category it appeared in
+
+PRODUCTS_COLLECTION = "products"
+LATEST_FIELDS = ('category', 'rank', 'title', 'price', 'rating', 'num_reviews', 'img_link')
+
+
+def latest_by_asin(records):
+    # Collapses a batch to one entry per ASIN: its newest record, first sighting and categories
+    latest = {}
+    for record in records:
+        entry = latest.get(record['asin'])
+        if entry is None:
+            latest[record['asin']] = {'record': record, 'first_seen': record['datetime'], 'categories': {record['category']}}
+            continue
+        entry['first_seen'] = min(entry['first_seen'], record['datetime'])
+        entry['categories'].add(record['category'])
+        if record['datetime'] >= entry['record']['datetime']:
+            entry['record'] = record
+    return latest
+
+
+def product_update(asin, record, first_seen, categories):
+    seen = record['datetime']
+    # Pipeline update so the latest fields are only replaced by a sighting at least as recent as the stored one
+    is_newer = {'$gte': [seen, {'$ifNull': ['$last_seen', seen]}]}
+    latest = {field: {'$cond': [is_newer, {'$literal': record.get(field)}, f'${field}']} for field in LATEST_FIELDS}
+    return UpdateOne(
+        {'_id': asin},
+        [{'$set': {
+            **latest,
+            'asin': {'$literal': asin},
+            'first_seen': {'$min': [{'$ifNull': ['$first_seen', first_seen]}, first_seen]},
+            'last_seen': {'$max': [{'$ifNull': ['$last_seen', seen]}, seen]},
+            'categories': {'$setUnion': [{'$ifNull': ['$categories', []]}, {'$literal': sorted(categories)}]},
+        }}],
+        upsert=True
+    )
+
+
+def update_products(db, records):
+    operations = [
+        product_update(asin, entry['record'], entry['first_seen'], entry['categories'])
+        for asin, entry in latest_by_asin(records).items()
+    ]
+    if operations:
+        db[PRODUCTS_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def backfill_pipeline():
+    # Rebuilds the products collection from the raw history on the server
+    return [
+        {'$match': {'datetime': {'$type': 'date'}}},
+        {'$sort': {'datetime': 1}},
+        {'$group': {
+            '_id': '$asin',
+            **{field: {'$last': f'${field}'} for field in LATEST_FIELDS},
+            'first_seen': {'$min': '$datetime'},
+            'last_seen': {'$max': '$datetime'},
+            'categories': {'$addToSet': '$category'},
+        }},
+        {'$set': {'asin': '$_id'}},
+        {'$merge': {'into': PRODUCTS_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+
+
+def backfill(db, collection_name="scrape_collection"):
+    db[collection_name].aggregate(backfill_pipeline(), allowDiskUse=True)
+    print(f"{db[PRODUCTS_COLLECTION].count_documents({})} products rebuilt")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the latest-state products collection from the raw history')
+    parser.add_argument('--database', default='amazon-project')
+    parser.add_argument('--collection', default='scrape_collection')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    backfill(client[args.database], args.collection)
+    client.close()
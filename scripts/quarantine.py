@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import shutil
+from collections import Counter
+from fixtures import save_page_html, list_fixtures, field_misses, capture_time
+from parse_html import extract_cards_html, build_page_records, page_url, is_last_page, PRODUCTS_PER_PAGE
+
+# Quarantine for malformed pages: a page whose cards fail the checks below is not stored. Its HTML is
+# saved with the fixture naming (plus a .json note with the run, URL and problems) so it can be reprocessed
+# offline once the parser is fixed, instead of scraping the whole category again. Retries of a run keep
+# only the latest copy of each page.
+
+QUARANTINE_DIR = "quarantine"
+REPROCESSED_DIR = "reprocessed"  # Subdirectory the pages move to once stored
+
+MAX_REJECTED_SHARE = 0.1  # Cards the record schema may reject before the page is suspect
+MAX_MISSING_SHARE = 0.5  # A field missing from more cards than this points at a broken selector
+# Only fields every card has: new products have no rating or reviews and some prices do not parse, so
+# those stay per-card gaps (counted in the crawl metrics) instead of rejecting the page
+STRUCTURAL_FIELDS = ('asin', 'title', 'img_link')
+
+
+def page_problems(cards, records, last_page=True):
+    # Reasons to distrust the page as a whole; an empty list means the page can be stored. last_page is
+    # whether the page ends its listing, the only page that may hold fewer than PRODUCTS_PER_PAGE cards
+    if not cards:
+        return ['no product cards']
+    problems = []
+    if len(cards) < PRODUCTS_PER_PAGE and not last_page:
+        problems.append(f'only {len(cards)}/{PRODUCTS_PER_PAGE} cards on a page before the last')
+    rejected = len(cards) - len(records)
+    if rejected > MAX_REJECTED_SHARE * len(cards):
+        problems.append(f'{rejected}/{len(cards)} cards rejected by the record schema')
+    duplicates = [asin for asin, count in Counter(card.get('asin') for card in cards).items() if asin and count > 1]
+    if duplicates:
+        problems.append(f'repeated ASINs: {", ".join(sorted(duplicates))}')
+    misses = field_misses(cards)
+    for field in STRUCTURAL_FIELDS:
+        if misses.get(field, 0) > MAX_MISSING_SHARE * len(cards):
+            problems.append(f'{field} missing from {misses[field]}/{len(cards)} cards')
+    return problems
+
+
+def note_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def read_note(path):
+    # The .json note of a quarantined page ({} for pages saved without one)
+    if not os.path.exists(note_path(path)):
+        return {}
+    with open(note_path(path), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_copies(quarantine_dir, run_id, category_name, page):
+    # Earlier copies of the same page in the same run (quarantined by previous attempts)
+    if not os.path.isdir(quarantine_dir):
+        return
+    for path, category, fixture_page in list_fixtures(quarantine_dir):
+        if category == category_name and fixture_page == page and read_note(path).get('run_id') == run_id:
+            for file_path in (path, note_path(path)):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+
+def quarantine_page(quarantine_dir, category_name, page, page_html, problems, url=None, run_id=None):
+    # url is the category URL the run tracks the page under
+    if run_id:
+        remove_copies(quarantine_dir, run_id, category_name, page)
+    path = save_page_html(quarantine_dir, category_name, page, page_html)
+    with open(note_path(path), 'w', encoding='utf-8') as f:
+        json.dump({
+            'category': category_name,
+            'page': page + 1,
+            'run_id': run_id,
+            'url': url,
+            'page_url': page_url(url, page) if url else None,
+            'problems': problems,
+        }, f, indent=2)
+    print(f"Quarantined page {page + 1} of {category_name}: {'; '.join(problems)}")
+    return path
+
+
+def move_to_reprocessed(quarantine_dir, path):
+    done_dir = os.path.join(quarantine_dir, REPROCESSED_DIR)
+    os.makedirs(done_dir, exist_ok=True)
+    for file_path in (path, note_path(path)):
+        if os.path.exists(file_path):
+            shutil.move(file_path, os.path.join(done_dir, os.path.basename(file_path)))
+
+
+def reprocess(quarantine_dir, collection=None):
+    # Parse every quarantined page again; pages that now pass are stored (when a collection is given) with
+    # the time they were scraped, checkpointed in their run, and moved to the reprocessed subdirectory.
+    # The rest stay where they are
+    stored = 0
+    for path, category_name, page in list_fixtures(quarantine_dir):
+        name = os.path.basename(path)
+        note = read_note(path)
+        run_id, url = note.get('run_id'), note.get('url')
+        if collection is not None and run_id and url:
+            from crawl_runs import pages_done_for
+            if page in pages_done_for(collection.database, run_id, url):
+                # A later attempt of the run stored the page
+                print(f"{name}: already stored by run {run_id}")
+                move_to_reprocessed(quarantine_dir, path)
+                continue
+
+        with open(path, encoding='utf-8') as f:
+            page_html = f.read()
+        cards = extract_cards_html(page_html)
+        records = build_page_records(cards, category_name, page, capture_time(path))
+        problems = page_problems(cards, records, is_last_page(page_html))
+        if problems:
+            print(f"{name}: still malformed ({'; '.join(problems)})")
+            continue
+        print(f"{name}: {len(records)} products")
+        if collection is None:
+            continue
+        from storage import write_records
+        write_records(collection, records)
+        if run_id and url:
+            from crawl_runs import mark_page_done
+            mark_page_done(collection.database, run_id, url, page)
+        stored += len(records)
+        move_to_reprocessed(quarantine_dir, path)
+    return stored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reprocess quarantined best-seller pages')
+    parser.add_argument('quarantine_dir', nargs='?', default=QUARANTINE_DIR)
+    parser.add_argument('--insert', action='store_true', help='Store the pages that now parse cleanly')
+    args = parser.parse_args()
+
+    collection = None
+    if args.insert:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+        load_dotenv()
+        client = MongoClient(os.getenv("MONGO_URI"))
+        collection = client["amazon-project"]["scrape_collection"]
+    print(f'{reprocess(args.quarantine_dir, collection)} products stored')
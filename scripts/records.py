@@ -0,0 +1,88 @@
+from datetime import datetime
+
+# Typed schema of a scraped product: every record is validated and normalized once, before it is stored
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+FIELDS = ('datetime', 'category', 'rank', 'asin', 'title', 'price', 'rating', 'num_reviews', 'img_link')
+
+# Placeholders older scrapes stored when a value was not found
+MISSING_PLACEHOLDERS = ('', '0', 'None')
+
+
+class RecordError(ValueError):
+    pass
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), DATETIME_FORMAT)
+    except ValueError:
+        raise RecordError(f"Invalid datetime: {value!r}")
+
+
+def to_float(value, zero_is_missing=False):
+    if value is None or isinstance(value, str) and value.strip() in MISSING_PLACEHOLDERS:
+        return None
+    try:
+        number = float(str(value).replace('€', '').replace(',', '.').strip()) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    if number != number or (zero_is_missing and number == 0):  # NaN, or a 0 standing for "not found"
+        return None
+    return number
+
+
+def to_int(value, zero_is_missing=False):
+    number = to_float(value, zero_is_missing)
+    return int(number) if number is not None else None
+
+
+def to_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def normalize_record(record):
+    asin = to_text(record.get('asin'))
+    if not asin:
+        raise RecordError("Missing ASIN")
+    category = to_text(record.get('category'))
+    if not category:
+        raise RecordError(f"Missing category for ASIN {asin}")
+    rank = to_int(record.get('rank'))
+
+    rating = to_float(record.get('rating'), zero_is_missing=True)  # Ratings go from 1 to 5
+    if rating is not None and not 0 < rating <= 5:
+        raise RecordError(f"Rating out of range for ASIN {asin}: {rating}")
+    price = to_float(record.get('price'), zero_is_missing=True)
+    if price is not None and price < 0:
+        raise RecordError(f"Negative price for ASIN {asin}: {price}")
+
+    return {
+        'datetime': to_datetime(record.get('datetime')),
+        'category': category,
+        'rank': rank,
+        'asin': asin,
+        'title': to_text(record.get('title')),
+        'price': price,
+        'rating': rating,
+        'num_reviews': to_int(record.get('num_reviews'), zero_is_missing=True),  # Products without reviews show no count
+        'img_link': to_text(record.get('img_link')),
+    }
+
+
+def normalize_records(records):
+    # Returns the valid records and the errors of the rejected ones
+    valid = []
+    errors = []
+    for record in records:
+        try:
+            valid.append(normalize_record(record))
+        except RecordError as e:
+            errors.append(str(e))
+    return valid, errors
@@ -0,0 +1,104 @@
+import argparse
+import os
+from collections import defaultdict
+from datetime import datetime, time
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+# Daily rollups per (category, day): record count, count/sum/sum of squares of each metric, the ASINs seen
+# and their distinct count ('unique_asins')
+
+ROLLUPS_COLLECTION = "daily_rollups"
+METRICS = ('price', 'rating', 'num_reviews')
+
+
+def rollup_id(category, day):
+    return f"{category}|{day:%Y-%m-%d}"
+
+
+def rollup_updates(records):
+    # Sums the increments of every (category, day) touched by the records
+    increments = defaultdict(lambda: defaultdict(int))
+    asins = defaultdict(set)
+    for record in records:
+        day = datetime.combine(record['datetime'].date(), time.min)
+        key = (record['category'], day)
+        increments[key]['count'] += 1
+        for metric in METRICS:
+            value = record.get(metric)
+            if value is not None:
+                increments[key][f'{metric}_count'] += 1
+                increments[key][f'{metric}_sum'] += value
+                increments[key][f'{metric}_sumsq'] += value * value
+        asins[key].add(record['asin'])
+
+    return [rollup_update(category, day, increments[(category, day)], asins[(category, day)]) for category, day in increments]
+
+
+def rollup_update(category, day, increments, asins):
+    # Pipeline update, so the distinct ASIN count is taken from the merged set in the same write
+    return UpdateOne(
+        {'_id': rollup_id(category, day)},
+        [
+            {'$set': {
+                'category': {'$literal': category},
+                'day': {'$literal': day},
+                **{field: {'$add': [{'$ifNull': [f'${field}', 0]}, value]} for field, value in increments.items()},
+                'asins': {'$setUnion': [{'$ifNull': ['$asins', []]}, {'$literal': sorted(asins)}]},
+                'updated_at': {'$literal': datetime.now()},
+            }},
+            {'$set': {'unique_asins': {'$size': '$asins'}}},
+        ],
+        upsert=True
+    )
+
+
+def update_rollups(db, records):
+    operations = rollup_updates(records)
+    if operations:
+        db[ROLLUPS_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def backfill_pipeline():
+    # Rebuilds every rollup from the raw history on the server
+    group = {
+        '_id': {'category': '$category', 'day': {'$dateTrunc': {'date': '$datetime', 'unit': 'day'}}},
+        'count': {'$sum': 1},
+        'asins': {'$addToSet': '$asin'},
+    }
+    for metric in METRICS:
+        is_number = {'$isNumber': f'${metric}'}
+        group[f'{metric}_count'] = {'$sum': {'$cond': [is_number, 1, 0]}}
+        group[f'{metric}_sum'] = {'$sum': f'${metric}'}
+        group[f'{metric}_sumsq'] = {'$sum': {'$cond': [is_number, {'$multiply': [f'${metric}', f'${metric}']}, 0]}}
+    return [
+        {'$match': {'datetime': {'$type': 'date'}}},
+        {'$group': group},
+        {'$set': {
+            'category': '$_id.category',
+            'day': '$_id.day',
+            '_id': {'$concat': ['$_id.category', '|', {'$dateToString': {'format': '%Y-%m-%d', 'date': '$_id.day'}}]},
+            'unique_asins': {'$size': '$asins'},
+            'updated_at': '$$NOW',
+        }},
+        {'$merge': {'into': ROLLUPS_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+
+
+def backfill(db, collection_name="scrape_collection"):
+    db[collection_name].aggregate(backfill_pipeline(), allowDiskUse=True)
+    print(f"{db[ROLLUPS_COLLECTION].count_documents({})} rollups rebuilt")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the daily rollups from the raw product history')
+    parser.add_argument('--database', default='amazon-project')
+    parser.add_argument('--collection', default='scrape_collection')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    backfill(client[args.database], args.collection)
+    client.close()
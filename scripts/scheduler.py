@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from crawl_runs import start_run, finish_run, run_urls
+from discover import crawl_urls
+from metrics import CrawlMetrics, METRICS_LOG, summarize, print_report
+from parse_html import scrape_amazon_url_http, fetch_html
+from scrape_all import scrape_amazon_url
+
+# Async crawl scheduler: bounded concurrency, a global request rate and retries with backoff
+
+
+class RateLimiter:
+    # Spaces calls evenly so no more than `rate` start per second, shared by all worker threads
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def backoff_delay(attempt, base=2, cap=120):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def crawl_url(url, scrape, num_pages, semaphore, max_retries, stats, metrics):
+    loop = asyncio.get_running_loop()
+    # Attempts, retries and time spent queued or backing off (the scrape itself is timed per page)
+    span = metrics.span('url', url=url)
+    for attempt in range(max_retries + 1):
+        span.count('attempts')
+        if attempt:
+            stats['retried'] += 1
+            span.count('retries')
+            delay = backoff_delay(attempt - 1)
+            print(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{max_retries + 1})")
+            with span.stage('backoff'):
+                await asyncio.sleep(delay)
+        with span.stage('queued'):
+            await semaphore.acquire()
+        try:
+            pages_done = await loop.run_in_executor(None, scrape, url, num_pages)
+        except Exception as e:
+            print(f"Error scraping {url}: {str(e)}")
+            span.count('errors')
+            continue
+        finally:
+            semaphore.release()
+        # A page that could not be fetched counts as a failed attempt
+        if pages_done is not None and pages_done >= num_pages:
+            stats['completed'] += 1
+            span.finish()
+            return True
+        print(f"Partial scrape of {url}: {pages_done}/{num_pages} pages")
+    stats['failed'] += 1
+    stats['failed_urls'].append(url)
+    span.count('failed')
+    span.finish()
+    return False
+
+
+async def crawl(urls, scrape, num_pages=2, concurrency=8, max_retries=3, metrics=None):
+    queue = list(dict.fromkeys(urls))  # Drop repeated URLs, keep order
+    semaphore = asyncio.Semaphore(concurrency)
+    metrics = metrics or CrawlMetrics()
+    # Enough threads for every concurrent scrape, since each one blocks on I/O
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    stats = {'completed': 0, 'failed': 0, 'retried': 0, 'failed_urls': []}
+    await asyncio.gather(*(crawl_url(url, scrape, num_pages, semaphore, max_retries, stats, metrics) for url in queue))
+    return stats
+
+
+def make_scraper(engine, mongo_uri, database_name, collection_name, limiter, run_id=None, metrics=None, capture_dir=None):
+    if engine == 'http':
+        def rate_limited_fetch(url):
+            limiter.acquire()
+            return fetch_html(url)
+        return partial(_scrape_http, fetcher=rate_limited_fetch, mongo_uri=mongo_uri, database_name=database_name,
+                       collection_name=collection_name, run_id=run_id, metrics=metrics, capture_dir=capture_dir)
+    return partial(_scrape_chrome, limiter=limiter, mongo_uri=mongo_uri, database_name=database_name,
+                   collection_name=collection_name, run_id=run_id, metrics=metrics, capture_dir=capture_dir)
+
+
+def _scrape_http(url, num_pages, fetcher, mongo_uri, database_name, collection_name, run_id, metrics, capture_dir=None):
+    return scrape_amazon_url_http(url, num_pages, mongo_uri, database_name, collection_name, fetcher=fetcher, delay=0,
+                                  run_id=run_id, metrics=metrics, capture_dir=capture_dir)
+
+
+def _scrape_chrome(url, num_pages, limiter, mongo_uri, database_name, collection_name, run_id, metrics, capture_dir=None):
+    # Chrome navigates on its own, so the limiter paces category starts instead of single requests
+    limiter.acquire()
+    return scrape_amazon_url(url, num_pages, mongo_uri, database_name, collection_name, run_id=run_id, metrics=metrics,
+                             capture_dir=capture_dir)
+
+
+def print_summary(stats):
+    print(f"Completed: {stats['completed']}  Failed: {stats['failed']}  Retried: {stats['retried']}")
+    for url in stats['failed_urls']:
+        print(f"  Failed: {url}")
+
+
+if __name__ == '__main__':
+    from multiscrape_all import links
+
+    parser = argparse.ArgumentParser(description='Crawl best-seller categories with rate limiting and retries')
+    parser.add_argument('--engine', choices=['http', 'chrome'], default='http')
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=1.0, help='Maximum requests per second')
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--resume', metavar='RUN_ID', help='Resume an interrupted run, scraping only its missing pages')
+    parser.add_argument('--discovered', action='store_true',
+                        help='Crawl the categories stored by discover.py instead of the built-in list')
+    parser.add_argument('--depth', type=int, default=None, help='With --discovered, deepest category level to crawl')
+    parser.add_argument('--metrics-log', default=METRICS_LOG, help='JSON-lines file for per-page stage timings')
+    parser.add_argument('--profile', metavar='STAGE', action='append', default=[],
+                        help='Run this stage (e.g. extract, write) under cProfile; repeatable')
+    parser.add_argument('--capture', metavar='DIR', default=None,
+                        help='Also save every page\'s HTML here, as fixtures for fixtures.py replay/benchmark')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI")
+    client = MongoClient(mongo_uri)
+    db = client["amazon-project"]
+    # A resumed run keeps the categories it started with
+    urls = (args.resume and run_urls(db, args.resume)) or (crawl_urls(db, args.depth) if args.discovered else links)
+    run_id = start_run(db, args.resume, urls, args.pages)
+    print(f"Crawl run {run_id}")
+
+    metrics = CrawlMetrics(args.metrics_log, run_id, args.profile)
+    scrape = make_scraper(args.engine, mongo_uri, "amazon-project", "scrape_collection", RateLimiter(args.rate), run_id, metrics,
+                          args.capture)
+    stats = asyncio.run(crawl(urls, scrape, args.pages, args.concurrency, args.retries, metrics))
+    finish_run(db, run_id, 'finished' if not stats['failed'] else 'incomplete')
+    client.close()
+    print_summary(stats)
+    print_report(summarize(metrics.records))
+    for path in metrics.dump_profiles():
+        print(f"Profile written to {path}")
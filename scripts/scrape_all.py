@@ -8,182 +8,270 @@ import csv
 import re
 from datetime import datetime
 from pymongo import MongoClient
+from storage import insert_into_mongodb, process_page
+from crawl_runs import pages_done_for
 import os
 from dotenv import load_dotenv
 from selenium.webdriver.chrome.options import Options
+from parse_html import parse_price, parse_rating, parse_num_reviews, category_from_url, page_url, PRODUCTS_PER_PAGE
+from fixtures import save_page_html
+from metrics import CrawlMetrics
+from quarantine import QUARANTINE_DIR
+from contextlib import nullcontext
 
-def insert_into_mongodb(data_list, mongo_uri, database_name, collection_name):
-    # Connect to MongoDB
-    client = MongoClient(mongo_uri)
-    db = client[database_name]
-    collection = db[collection_name]
-
-    products_added = 0
-
-    for data in data_list:
-        # Insert data into MongoDB
-        collection.insert_one(data)
-        products_added += 1
-        print(f"ASIN {data['asin']} Added. Total Products added: {products_added}")
-
-    # Close MongoDB connection
-    client.close()
 
 # Example usage:
 # insert_into_mongodb(data_list, "your_mongo_uri", "your_database_name", "your_collection_name")
 
 
 
-def scrape_amazon_url(url, num_pages, mongo_uri, database_name, collection_name):
-    counter = 1
-
+# Selector of each product card in the best-seller grid
+CARD_CLASS = 'a-cardui._cDEzb_grid-cell_1uMOS.expandableGrid.p13n-grid-content'
+
+# Collects the raw fields of every product card in a single WebDriver round trip
+EXTRACT_CARDS_JS = """
+var cards = document.getElementsByClassName('a-cardui _cDEzb_grid-cell_1uMOS expandableGrid p13n-grid-content');
+var records = [];
+for (var i = 0; i < cards.length; i++) {
+    var card = cards[i];
+    var asinElement = card.querySelector('div[data-asin]');
+    var imageElement = card.querySelector('a.a-link-normal div.a-section img.a-dynamic-image');
+    var priceElement = card.querySelector('.a-size-base.a-color-price ._cDEzb_p13n-sc-price_3mJ9Z');
+    var ratingElement = card.querySelector('i.a-icon-star-small span.a-icon-alt');
+    var reviewsElement = card.querySelector('a[class="a-link-normal"] span.a-size-small');
+    records.push({
+        'asin': asinElement ? asinElement.getAttribute('data-asin') : null,
+        'title': imageElement ? imageElement.getAttribute('alt') : null,
+        'img_link': imageElement ? imageElement.getAttribute('src') : null,
+        'price': priceElement ? priceElement.innerText : null,
+        'rating': ratingElement ? ratingElement.textContent : null,
+        'num_reviews': reviewsElement ? reviewsElement.innerText : null
+    });
+}
+return records;
+"""
+
+
+def extract_cards_script(driver):
+    # Run the extraction script and clean the raw strings it returns
+    raw_cards = driver.execute_script(EXTRACT_CARDS_JS)
+    return [
+        {
+            'asin': card['asin'],
+            'title': card['title'],
+            'price': parse_price(card['price']),
+            'rating': parse_rating(card['rating']),
+            'num_reviews': parse_num_reviews(card['num_reviews']),
+            'img_link': card['img_link']
+        }
+        for card in raw_cards
+    ]
+
+
+# Selectors of each field inside a product card
+CARD_FIELD_SELECTORS = {
+    'asin': (By.CSS_SELECTOR, 'div[data-asin]'),
+    'image': (By.XPATH, './/a[contains(@class, "a-link-normal")]/div[contains(@class, "a-section")]/img[contains(@class, "a-dynamic-image")]'),
+    'price': (By.CSS_SELECTOR, '.a-size-base.a-color-price ._cDEzb_p13n-sc-price_3mJ9Z'),
+    'rating': (By.CSS_SELECTOR, 'i.a-icon-star-small span.a-icon-alt'),
+    'num_reviews': (By.CSS_SELECTOR, 'a[class="a-link-normal"] span.a-size-small'),
+}
+
+
+def find_in_card(card, field):
+    # find_elements instead of find_element: a missing field is None, not an exception
+    elements = card.find_elements(*CARD_FIELD_SELECTORS[field])
+    return elements[0] if elements else None
+
+
+def extract_cards_elements(driver, caja_productos, span=None):
+    # One find_element/get_attribute round trip per field and product. Every field is looked up inside
+    # its own card, so a missing value stays None on that card instead of shifting the others
+    # (each field is timed as its own stage when a metrics span is given)
+    stage = span.stage if span else lambda name: nullcontext()
+
+    cards = []
+    for producto in caja_productos:
+        with stage('extract_asin'):
+            asin_element = find_in_card(producto, 'asin')
+            asin = asin_element.get_attribute('data-asin') if asin_element is not None else None
+        with stage('extract_title'):
+            # The title is the "alt" attribute of the image, whose "src" is the image link
+            image_element = find_in_card(producto, 'image')
+            title = image_element.get_attribute('alt') if image_element is not None else None
+            img_link = image_element.get_attribute('src') if image_element is not None else None
+        with stage('extract_price'):
+            price_element = find_in_card(producto, 'price')
+            price = parse_price(price_element.text) if price_element is not None else None
+        with stage('extract_rating'):
+            rating_element = find_in_card(producto, 'rating')
+            rating = parse_rating(rating_element.get_attribute('textContent')) if rating_element is not None else None
+        with stage('extract_num_reviews'):
+            reviews_element = find_in_card(producto, 'num_reviews')
+            num_reviews = parse_num_reviews(reviews_element.text) if reviews_element is not None else None
+        cards.append({
+            'asin': asin,
+            'title': title,
+            'price': price,
+            'rating': rating,
+            'num_reviews': num_reviews,
+            'img_link': img_link
+        })
+    return cards
+
+
+def scroll_with_sleeps(driver):
+    # Fixed-delay fallback: scroll until the page height stops growing
+    time.sleep(1)
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    while True:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(4)  # Increase the sleep duration to 4 seconds (or adjust as needed)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+
+    time.sleep(2)
+
+
+def wait_for_products(driver, expected=PRODUCTS_PER_PAGE, timeout=20, poll=0.25, settle_polls=4):
+    # Scroll and poll until the expected number of cards is present or the page height settles
+    deadline = time.monotonic() + timeout
+    last_height = None
+    stable = 0
+    while time.monotonic() < deadline:
+        num_cards, height = driver.execute_script(
+            "window.scrollTo(0, document.body.scrollHeight);"
+            "return [document.getElementsByClassName(arguments[0]).length, document.body.scrollHeight];",
+            CARD_CLASS.replace('.', ' ')
+        )
+        if num_cards >= expected:
+            return num_cards
+        stable = stable + 1 if height == last_height else 0
+        if num_cards > 0 and stable >= settle_polls:
+            return num_cards
+        last_height = height
+        time.sleep(poll)
+    print(f"Timed out waiting for {expected} products")
+    return 0
+
+
+def build_driver(headless=False):
     # Options for webdriver
     opciones=Options()
     opciones.add_experimental_option('excludeSwitches', ['enable-automation'])
     opciones.add_experimental_option('useAutomationExtension', False)
-    # Start a driver instance
-    driver = webdriver.Chrome(opciones)
-    driver.get(url)
+    if headless:
+        opciones.add_argument('--headless=new')
+        opciones.add_argument('--window-size=1920,1080')
+    return webdriver.Chrome(opciones)
+
+
+def scrape_amazon_url(url, num_pages, mongo_uri, database_name, collection_name, extraction='script', capture_dir=None, wait_mode='events', driver=None, run_id=None, metrics=None,
+                      quarantine_dir=QUARANTINE_DIR):
+    counter = 1
+    # Per-stage timings and counters (kept in memory only unless the caller passes a logging collector)
+    metrics = metrics or CrawlMetrics()
+
+    # One connection for the whole category: every page is written as soon as it is extracted
+    client = MongoClient(mongo_uri)
+    db = client[database_name]
+    collection = db[collection_name]
+
+    owns_driver = driver is None
+    try:
+        # Pages already stored by this run are skipped when resuming
+        done = pages_done_for(db, run_id, url) if run_id else set()
+        if done:
+            print(f"Resuming {url}: pages {sorted(page + 1 for page in done)} already stored")
 
-    data_list = []
         # Extract the category name from the URL
-    category_name = re.search(r'/bestsellers/([^/]+)/', url).group(1)
-    for page in range(num_pages):
-        time.sleep(2)  # Add a delay if needed
-
-        # Close cookies popup - if needed, if not proceed
-        try:
-            driver.find_element(By.XPATH, '//*[@id="sp-cc-accept"]').click()
-            print('Cookies Accepted, starting scrape...')
-            print(f'Scraping {category_name} Top 100 ----------------------------------------- page: {counter}')
-            time.sleep(1)
-        except:
-            print("Cookies not needed")
-            print(f'Scraping {category_name} Top 100 ----------------------------------------- page: {counter}')
-        time.sleep(1)
-
-        # SCROLL TO THE END OF THE PAGE
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(4)  # Increase the sleep duration to 4 seconds (or adjust as needed)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-        time.sleep(2)
-
-        wait = WebDriverWait(driver, 20)  # Adjust the timeout as needed
-        caja_productos = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'a-cardui._cDEzb_grid-cell_1uMOS.expandableGrid.p13n-grid-content')))
-        #print('The length of caja productos is:', len(caja_productos))
-
-        n_of_reviews = []
-        # Extract the number of reviews for each element
-        for producto in caja_productos:
-            try:
-                reviews_element = producto.find_element(By.CSS_SELECTOR, 'a[class="a-link-normal"] span.a-size-small')
-                number_of_reviews = str(reviews_element.text).replace('.', '')
-                n_of_reviews.append(float(number_of_reviews))
-            except:
-                n_of_reviews.append(0)
-
-
-        # Create a list to store the titles
-        titles = []
-
-        for producto in caja_productos:
-            try:
-                # Find the title element using XPath
-                title_element = producto.find_element(By.XPATH,
-                                                      './/a[contains(@class, "a-link-normal")]/div[contains(@class, "a-section")]/img[contains(@class, "a-dynamic-image")]')
-
-                # Extract the title text from the "alt" attribute of the image
-                title_text = title_element.get_attribute('alt')
-
-                if title_text:  # Check if the title is not empty
-                    titles.append(title_text)
-            except Exception as e:
-                print(f"Error while extracting title: {e}")
-
-        ratings = []
-        ratings_float = []
-        prices = []  # Initialize an empty list to store prices
-
-        for product in caja_productos:
-            try:
-                price_element = product.find_element(By.CSS_SELECTOR, ".a-size-base.a-color-price ._cDEzb_p13n-sc-price_3mJ9Z")
-                price_text = price_element.text
-                # Clean the price text (remove currency symbol and replace comma with dot)
-                price_text = price_text.replace('€', '').replace(',', '.').strip()
-                prices.append(float(price_text))
-            except:
-                prices.append('0')  # Append '0' when the price selector is not found for a product
-
-        # RATING EXTRACTION AND CLEANING
-
-        for product in caja_productos:
-            try:
-                rating_element = product.find_element(By.CSS_SELECTOR, "i.a-icon-star-small span.a-icon-alt")
-                rating_text = rating_element.get_attribute("textContent")
-                if rating_text.strip():
-                    rating = rating_text.split(" de ")[0]
+        category_name = category_from_url(url)
+        category_span = metrics.span('category', category=category_name, engine='chrome', extraction=extraction)
+
+        # Start a driver instance unless the caller keeps a long-lived one
+        if owns_driver:
+            with category_span.stage('driver_start'):
+                driver = build_driver()
+        current_page = None
+
+        for page in range(num_pages):
+            if page in done:
+                continue
+            counter = page + 1
+            page_span = metrics.span('page', category=category_name, page=counter, engine='chrome', extraction=extraction)
+
+            with page_span.stage('navigate'):
+                # Load the page directly unless the previous click already got us here
+                if current_page != page:
+                    driver.get(page_url(url, page))
+                    current_page = page
+
+                if wait_mode == 'sleep':
+                    time.sleep(2)  # Add a delay if needed
+
+                # Close cookies popup - if needed, if not proceed
+                try:
+                    driver.find_element(By.XPATH, '//*[@id="sp-cc-accept"]').click()
+                    print('Cookies Accepted, starting scrape...')
+                    print(f'Scraping {category_name} Top 100 ----------------------------------------- page: {counter}')
+                    if wait_mode == 'sleep':
+                        time.sleep(1)
+                except:
+                    print("Cookies not needed")
+                    print(f'Scraping {category_name} Top 100 ----------------------------------------- page: {counter}')
+
+            # SCROLL TO THE END OF THE PAGE
+            with page_span.stage('wait'):
+                if wait_mode == 'sleep':
+                    scroll_with_sleeps(driver)
                 else:
-                    rating = '0'
-            except:
-                rating = '0'
-
-            ratings.append(rating)
-            rating_value = rating.replace(',', '.').strip()
-            ratings_float.append(float(rating_value))
-
-        # IMAGE EXTRACTION
-
-        image_elements = driver.find_elements(By.CSS_SELECTOR, "div[data-asin] a.a-link-normal img.a-dynamic-image")
-        image_links = [image.get_attribute("src") for image in image_elements]
-
-        # ASIN EXTRACTION
-
-        asin_elements = driver.find_elements(By.XPATH, '//div[@data-asin]')
-        asin = [i.get_attribute('data-asin') for i in asin_elements]
-
-        # CHECK LEN OF EXTRACTED VALUES (SHOULD = 50)
-        print('asin', len(asin), 'title', len(titles), 'precio', len(prices), 'ratings', len(ratings),
-              'num_reviews', len(n_of_reviews), 'image links', len(image_links))
-
-        # Create a list of dictionaries for the current page's data, including 'datetime'
-        page_data = [
-            {
-                'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'category': category_name,
-                'rank': rank + (page * 50),  # Adjust rank for each page
-                'asin': a,
-                'title': t,
-                'price': p,
-                'rating': rt,
-                'num_reviews': nr,
-                'img_link': il
-            }
-            for rank, (a, t, p, rt, nr, il) in enumerate(zip(asin, titles, prices, ratings_float, n_of_reviews, image_links), start=1)
-        ]
-
-        # Append data to MongoDB
-        data_list.extend(page_data)
-
-        # Step 6: Click on the element to navigate to the next page
-        try:
-            next_page_element = driver.find_element(By.CSS_SELECTOR,
-                                                     'div.a-cardui._cDEzb_card_1L-Yx > div.a-text-center > ul > li.a-last')
-            next_page_element.click()
-            counter += 1
-        except:
-            print(f"Failed to navigate to page {page + 1}")
-
-    # Insert data into MongoDB
-    insert_into_mongodb(data_list, mongo_uri, database_name, collection_name)
-
-    # Close the web driver when you're done
-    driver.quit()
+                    wait_for_products(driver)
+
+                wait = WebDriverWait(driver, 20)  # Adjust the timeout as needed
+                caja_productos = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, CARD_CLASS)))
+                #print('The length of caja productos is:', len(caja_productos))
+
+            # Save the rendered page so it can be replayed offline
+            if capture_dir:
+                with page_span.stage('capture'):
+                    save_page_html(capture_dir, category_name, page, driver.page_source)
+
+            if extraction == 'script':
+                with page_span.stage('extract'):
+                    cards = extract_cards_script(driver)
+            else:
+                cards = extract_cards_elements(driver, caja_productos, page_span)
+
+            if process_page(collection, cards, lambda: driver.page_source, category_name, url, page, page_span, run_id, quarantine_dir):
+                done.add(page)
+
+            # Step 6: Click on the element to navigate to the next page (nothing to do after the last page)
+            if page + 1 < num_pages and page + 1 not in done:
+                with page_span.stage('next_page'):
+                    try:
+                        next_page_element = driver.find_element(By.CSS_SELECTOR,
+                                                                 'div.a-cardui._cDEzb_card_1L-Yx > div.a-text-center > ul > li.a-last')
+                        first_card = caja_productos[0]
+                        next_page_element.click()
+                        # Wait for the current grid to be replaced instead of sleeping
+                        if wait_mode != 'sleep':
+                            WebDriverWait(driver, 20).until(EC.staleness_of(first_card))
+                        current_page = page + 1
+                    except:
+                        print(f"Failed to navigate to page {page + 2}")
+                        page_span.count('navigation_failures')
+            page_span.finish()
+    finally:
+        # Close MongoDB connection and the web driver, also when a page raises
+        client.close()
+        if owns_driver and driver is not None:
+            driver.quit()
+
+    category_span.count('pages', len(done & set(range(num_pages))))
+    category_span.finish()
+    return len(done & set(range(num_pages)))
     
 '''
   # Load environment variables from the .env file
@@ -0,0 +1,135 @@
+import argparse
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient, ASCENDING
+
+# Creates and verifies the indexes behind the dashboard and scraper access patterns
+
+INDEXES = {
+    'scrape_collection': [
+        ('category_datetime', [('category', ASCENDING), ('datetime', ASCENDING)]),
+        ('asin_datetime', [('asin', ASCENDING), ('datetime', ASCENDING)]),
+        ('datetime', [('datetime', ASCENDING)]),
+    ],
+    'crawl_pages': [
+        ('run_id', [('run_id', ASCENDING)]),
+    ],
+    'crawl_jobs': [
+        ('status_lease_expires', [('status', ASCENDING), ('lease_expires', ASCENDING)]),
+        ('run_id_status', [('run_id', ASCENDING), ('status', ASCENDING)]),
+    ],
+    'categories': [
+        ('active_depth', [('active', ASCENDING), ('depth', ASCENDING)]),
+    ],
+    'daily_rollups': [
+        ('day_category', [('day', ASCENDING), ('category', ASCENDING)]),
+    ],
+    'products': [
+        ('last_seen', [('last_seen', ASCENDING)]),
+        ('category_last_seen', [('category', ASCENDING), ('last_seen', ASCENDING)]),
+    ],
+    'price_history': [
+        ('asin_datetime', [('asin', ASCENDING), ('datetime', ASCENDING)]),
+    ],
+}
+
+# Representative queries used to check that the indexes are picked up
+SAMPLE_QUERIES = {
+    'scrape_collection': [
+        ('category + date range', {'category': 'kitchen', 'datetime': {'$gte': datetime(2024, 1, 1), '$lt': datetime(2024, 1, 8)}}),
+        ('asin history', {'asin': 'B000000000'}),
+        ('date range', {'datetime': {'$gte': datetime(2024, 1, 1), '$lt': datetime(2024, 1, 2)}}),
+    ],
+    'price_history': [
+        ('asin history', {'asin': 'B000000000'}),
+    ],
+}
+
+
+def create_indexes(db):
+    for collection_name, indexes in INDEXES.items():
+        for name, keys in indexes:
+            db[collection_name].create_index(keys, name=name)
+            print(f'{collection_name}: index {name} ready')
+
+
+def verify_indexes(db):
+    # Returns the expected indexes that are missing or have different keys
+    problems = []
+    for collection_name, indexes in INDEXES.items():
+        existing = {index['name']: list(index['key'].items()) for index in db[collection_name].list_indexes()}
+        for name, keys in indexes:
+            if name not in existing:
+                problems.append(f'{collection_name}: missing index {name}')
+            elif existing[name] != keys:
+                problems.append(f'{collection_name}: index {name} has keys {existing[name]}, expected {keys}')
+    return problems
+
+
+def winning_stages(plan):
+    # Flattens the winning plan into its stage names, e.g. ['FETCH', 'IXSCAN']
+    stages = [plan.get('stage')]
+    if 'inputStage' in plan:
+        stages += winning_stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        stages += winning_stages(child)
+    return stages
+
+
+def find_index_name(plan):
+    if plan.get('stage') == 'IXSCAN':
+        return plan.get('indexName')
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        if child:
+            name = find_index_name(child)
+            if name:
+                return name
+    return None
+
+
+def explain_queries(db):
+    for collection_name, queries in SAMPLE_QUERIES.items():
+        for label, query in queries:
+            explain = db[collection_name].find(query).explain()
+            plan = explain['queryPlanner']['winningPlan']
+            plan = plan.get('queryPlan', plan)  # Newer servers nest the plan under queryPlan
+            stats = explain.get('executionStats', {})
+            print(f"{collection_name} [{label}]: {' <- '.join(winning_stages(plan))} "
+                  f"(index: {find_index_name(plan) or 'none'}, "
+                  f"docs examined: {stats.get('totalDocsExamined', '?')}, returned: {stats.get('nReturned', '?')})")
+
+
+def index_usage(db):
+    for collection_name in INDEXES:
+        for stats in db[collection_name].aggregate([{'$indexStats': {}}]):
+            print(f"{collection_name}: {stats['name']} used {stats['accesses']['ops']} times "
+                  f"since {stats['accesses']['since']:%Y-%m-%d %H:%M}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create, verify and inspect MongoDB indexes')
+    parser.add_argument('command', choices=['create', 'verify', 'explain', 'usage'])
+    parser.add_argument('--database', default='amazon-project')
+    args = parser.parse_args()
+
+    # Load environment variables from the .env file
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client[args.database]
+
+    if args.command == 'create':
+        create_indexes(db)
+    elif args.command == 'verify':
+        problems = verify_indexes(db)
+        for problem in problems:
+            print(problem)
+        print('All indexes present' if not problems else f'{len(problems)} index problems found')
+    elif args.command == 'explain':
+        explain_queries(db)
+    else:
+        index_usage(db)
+
+    client.close()
+    if args.command == 'verify' and problems:
+        raise SystemExit(1)
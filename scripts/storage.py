@@ -0,0 +1,112 @@
+import os
+import time
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from rollups import update_rollups
+from products import update_products
+from price_history import record_changes
+from crawl_runs import mark_page_done
+from parse_html import build_page_records, is_last_page, PRODUCTS_PER_PAGE
+from fixtures import field_misses
+from quarantine import page_problems, quarantine_page, QUARANTINE_DIR
+
+# MongoDB write path shared by every scraping engine
+
+# 'full' stores every scraped record; 'compact' only keeps the change-only price history and the summaries
+HISTORY_MODE = os.getenv("HISTORY_MODE", "full")
+
+
+def insert_batches(collection, data_list, batch_size=500):
+    inserted = []
+    duplicates = 0
+    failed = 0
+
+    # Insert data in unordered batches: one round trip per batch instead of per product,
+    # and a bad document does not stop the rest of the batch from being written
+    for i in range(0, len(data_list), batch_size):
+        batch = data_list[i:i + batch_size]
+        try:
+            collection.insert_many(batch, ordered=False)
+            inserted.extend(batch)
+        except BulkWriteError as e:
+            details = e.details
+            failed_indexes = {error['index'] for error in details.get('writeErrors', [])}
+            inserted.extend(record for index, record in enumerate(batch) if index not in failed_indexes)
+            for error in details.get('writeErrors', []):
+                if error.get('code') == 11000:
+                    duplicates += 1
+                else:
+                    failed += 1
+                    print(f"Failed to insert ASIN {batch[error['index']].get('asin')}: {error.get('errmsg')}")
+
+    return inserted, duplicates, failed
+
+
+def write_records(collection, data_list, batch_size=500, summaries=True, history_mode=None):
+    history_mode = history_mode or HISTORY_MODE
+    start = time.perf_counter()
+
+    if history_mode == 'compact':
+        # Raw rows are not stored, the change-only history below keeps what changed
+        inserted, duplicates, failed = list(data_list), 0, 0
+    else:
+        inserted, duplicates, failed = insert_batches(collection, data_list, batch_size)
+
+    # Keep the rollups, the price history and the latest state per ASIN in step with the records
+    changes = 0
+    if summaries or history_mode == 'compact':
+        db = collection.database
+        update_rollups(db, inserted)
+        changes = record_changes(db, inserted)
+        update_products(db, inserted)
+
+    elapsed = time.perf_counter() - start
+    rate = len(inserted) / elapsed if elapsed > 0 else 0
+    print(f"Products added: {len(inserted)}/{len(data_list)} (duplicates: {duplicates}, failed: {failed}, "
+          f"history changes: {changes}) in {elapsed:.2f}s ({rate:.1f} docs/sec)")
+
+    return len(inserted)
+
+
+def process_page(collection, cards, page_source, category_name, url, page, page_span, run_id=None, quarantine_dir=QUARANTINE_DIR):
+    # Shared by both engines once a page's cards are extracted: type the records, count what was found, then
+    # store and checkpoint the page, or quarantine it. page_source() returns the HTML and is only called for
+    # quarantined pages. Returns True when the page was stored
+    with page_span.stage('parse'):
+        page_data = build_page_records(cards, category_name, page)
+    page_span.count('cards', len(cards))
+    page_span.count('records', len(page_data))
+    page_span.count('skipped', len(cards) - len(page_data))
+    for field, misses in field_misses(cards).items():
+        page_span.count(f'miss_{field}', misses)
+
+    # The HTML is only needed to tell whether a short page is the listing's last
+    last_page = len(cards) >= PRODUCTS_PER_PAGE or is_last_page(page_source())
+    problems = page_problems(cards, page_data, last_page)
+    if problems:
+        # Keep the HTML for offline reprocessing; the page stays missing from the run
+        with page_span.stage('quarantine'):
+            quarantine_page(quarantine_dir, category_name, page, page_source(), problems, url, run_id)
+        page_span.count('quarantined')
+        return False
+
+    # Flush the page to MongoDB and checkpoint it
+    with page_span.stage('write'):
+        write_records(collection, page_data)
+        if run_id:
+            mark_page_done(collection.database, run_id, url, page)
+    return True
+
+
+def insert_into_mongodb(data_list, mongo_uri, database_name, collection_name, batch_size=500):
+    # Connect to MongoDB
+    client = MongoClient(mongo_uri)
+    db = client[database_name]
+    collection = db[collection_name]
+
+    products_added = write_records(collection, data_list, batch_size)
+
+    # Close MongoDB connection
+    client.close()
+
+    return products_added
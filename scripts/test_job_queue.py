@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import unittest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+import job_queue
+
+# Lease logic of the crawl job queue, against a real mongod: MONGO_URI (environment only, so a .env pointing
+# at the production cluster is never used) or a local server. Skipped when none is reachable.
+# Run from scripts/: python -m unittest test_job_queue  (or pytest)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+TEST_DATABASE = f"crawl_jobs_test_{os.getpid()}"
+URLS = [f"https://www.amazon.es/gp/bestsellers/category{i}" for i in range(6)]
+
+
+def connect():
+    try:
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+        client.admin.command('ping')
+        return client
+    except PyMongoError:
+        return None
+
+
+client = connect()
+
+
+@unittest.skipIf(client is None, f"no mongod reachable at {MONGO_URI}")
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        client.drop_database(TEST_DATABASE)
+        self.db = client[TEST_DATABASE]
+
+    def tearDown(self):
+        client.drop_database(TEST_DATABASE)
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(job_queue.enqueue(self.db, 'run', URLS + URLS[:2], 2), len(URLS))
+        self.assertEqual(job_queue.enqueue(self.db, 'run', URLS, 2), 0)
+        self.assertEqual(job_queue.queue_counts(self.db, 'run')['queued'], len(URLS))
+
+    def test_concurrent_claims_lease_each_job_once(self):
+        job_queue.enqueue(self.db, 'run', URLS, 2)
+        claimed = []
+        lock = threading.Lock()
+
+        def worker(worker_id):
+            while True:
+                job = job_queue.claim(self.db, worker_id)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job['url'])
+
+        threads = [threading.Thread(target=worker, args=(f'worker-{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(URLS))
+        self.assertEqual(job_queue.queue_counts(self.db, 'run')['leased'], len(URLS))
+
+    def test_expired_lease_is_claimed_again(self):
+        job_queue.enqueue(self.db, 'run', URLS[:1], 2)
+        first = job_queue.claim(self.db, 'a', lease_seconds=0)
+        time.sleep(0.05)
+        second = job_queue.claim(self.db, 'b')
+        self.assertEqual(second['_id'], first['_id'])
+        self.assertEqual(second['attempts'], 2)
+        # The first worker lost the lease: it can neither renew nor complete the job
+        self.assertFalse(job_queue.renew(self.db, first, 'a'))
+        job_queue.complete(self.db, first, 'a')
+        self.assertEqual(job_queue.queue_counts(self.db, 'run')['leased'], 1)
+        self.assertTrue(job_queue.renew(self.db, second, 'b'))
+        job_queue.complete(self.db, second, 'b')
+        self.assertEqual(job_queue.queue_counts(self.db, 'run')['done'], 1)
+
+    def test_live_lease_is_not_claimed(self):
+        job_queue.enqueue(self.db, 'run', URLS[:1], 2)
+        self.assertIsNotNone(job_queue.claim(self.db, 'a'))
+        self.assertIsNone(job_queue.claim(self.db, 'b'))
+
+    def test_fail_requeues_until_attempts_run_out(self):
+        job_queue.enqueue(self.db, 'run', URLS[:1], 2, max_attempts=2)
+        job = job_queue.claim(self.db, 'a')
+        self.assertEqual(job_queue.fail(self.db, job, 'a', 'boom'), 'queued')
+        job = job_queue.claim(self.db, 'a')
+        self.assertEqual(job['attempts'], 2)
+        self.assertEqual(job_queue.fail(self.db, job, 'a', 'boom'), 'failed')
+        self.assertIsNone(job_queue.claim(self.db, 'a'))
+        self.assertEqual(self.db[job_queue.JOBS_COLLECTION].find_one({'_id': job['_id']})['last_error'], 'boom')
+
+    def test_expire_exhausted_fails_dead_last_attempts(self):
+        job_queue.enqueue(self.db, 'run', URLS[:2], 2, max_attempts=1)
+        job_queue.claim(self.db, 'a', lease_seconds=0)  # Worker dies on its only attempt
+        job_queue.claim(self.db, 'b')  # Still running
+        time.sleep(0.05)
+        self.assertIsNone(job_queue.claim(self.db, 'c'))
+        self.assertEqual(job_queue.expire_exhausted(self.db, 'run'), 1)
+        counts = job_queue.queue_counts(self.db, 'run')
+        self.assertEqual((counts['failed'], counts['leased']), (1, 1))
+
+    def test_work_drains_the_queue(self):
+        job_queue.enqueue(self.db, 'run', URLS, 2, max_attempts=2)
+
+        def scrape(url, num_pages, run_id):
+            if url == URLS[0]:
+                raise RuntimeError('boom')
+            return 1 if url == URLS[1] else num_pages  # URLS[1] only ever stores one of its pages
+
+        self.assertEqual(job_queue.work(self.db, scrape, 'a', run_id='run', poll=0), len(URLS) + 2)
+        self.assertEqual(job_queue.queue_counts(self.db, 'run'), {'queued': 0, 'leased': 0, 'done': 4, 'failed': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
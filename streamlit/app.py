@@ -1,5 +1,4 @@
 import streamlit as st
-from pymongo import MongoClient
 import pandas as pd
 import numpy as np
 import plotly.express as px
@@ -16,6 +15,10 @@ import streamlit.components.v1 as components
 from pyecharts.charts import Scatter
 from pyecharts.commons.utils import JsCode
 import os
+from sources import get_source
+from filters import get_index
+from data import daily_totals, REFRESH_TTL
+from charts import histogram, scatter
 
 # Set page config as the first Streamlit command
 st.set_page_config(
@@ -23,35 +26,23 @@ st.set_page_config(
     page_icon='🔎'
 )
 
-# Access secrets
-mongo_uri = st.secrets['MONGO_URI']
+# Data source: MongoDB (URI from secrets) or a local Parquet snapshot when SNAPSHOT_PATH is set
+source, source_key = get_source()
 
 
-# Connect to MongoDB
-client = MongoClient(mongo_uri)
-db = client["amazontracker"]
-collection = db["scrape_collection"]
-print('CONNECTED')
+# Load data (cached across reruns; from MongoDB it is refreshed incrementally)
+df = source.load_frame(source_key)
 
-# Fetch data from MongoDB
-data = list(collection.find())
+# Sorted view of the frame with precomputed day keys and memoized filters (rebuilt only when df changes)
+index = get_index(df)
 
-print(len(data))
-
-# Convert data to DataFrame
-df = pd.DataFrame(data)
-
-# Convert 'price' column to float, handling non-numeric values
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
-
-# Convert 'datetime' column to datetime
-df['datetime'] = pd.to_datetime(df['datetime'])
+print(len(df))
 
 # Calculate the total number of products
 total_products = len(df)
 
 # Calculate the daily count of items
-daily_count = df.groupby(df['datetime'].dt.date).size().reset_index(name='count')
+daily_count = source.daily_counts(source_key)
 
 # Add 'formatted_date' column to daily_count
 daily_count['formatted_date'] = pd.to_datetime(daily_count['datetime']).dt.strftime('%Y-%m-%d')
@@ -60,7 +51,7 @@ daily_count['formatted_date'] = pd.to_datetime(daily_count['datetime']).dt.strft
 daily_count['cumulative_count'] = daily_count['count'].cumsum()
 
 # Calculate the total number of products
-total_products = daily_count['cumulative_count'].iloc[-1]
+total_products = daily_count['cumulative_count'].iloc[-1] if len(daily_count) else 0
 
 # Calculate the count from 24 hours ago
 count_24h_ago = daily_count['cumulative_count'].iloc[-2] if len(daily_count) > 1 else 0
@@ -74,8 +65,17 @@ percentage_increase_24h = ((added_today) / count_24h_ago) * 100 if count_24h_ago
 # Title
 st.sidebar.title("AmazonTracker `v1.0`")
 
-# Calculate the total number of unique ASINs
-total_unique_asins = df['asin'].nunique()
+# Total number of unique ASINs, from the products collection
+total_unique_asins = source.unique_product_count(source_key)
+
+# The summary collections are filled by the scraper; an existing database needs them backfilled once
+if len(df) and (daily_count.empty or not total_unique_asins):
+    st.sidebar.warning("Summaries not built yet: run scripts/rollups.py and scripts/products.py (see the README).")
+
+# With HISTORY_MODE=compact the scraper only updates the summaries, so the records behind the filters and KPIs stop early
+if len(df) and not daily_count.empty and pd.to_datetime(daily_count['datetime']).max().date() > df['datetime'].max().date():
+    st.sidebar.warning(f"Records end on {df['datetime'].max().date()}: later days were scraped with HISTORY_MODE=compact, "
+                       "so the filters and KPIs do not include them (see the README).")
 
 # Display total number of unique ASINs, actual number of records, and percentage increase with green color
 st.sidebar.markdown(
@@ -93,15 +93,14 @@ st.sidebar.markdown(
 
 st.sidebar.header('Filters🔎')
 
-# Fetch unique categories and days from MongoDB
-categories = collection.distinct("category")
+# Fetch unique categories and days from the loaded data
+categories = sorted(df["category"].unique())
 # Add 'All' category to the list of categories at the beginning
 categories.insert(0, 'All records')
 categories.insert(1, 'Unique Products')
 
 # Fetch unique days and add 'All' to the list of days
-days = sorted(df["datetime"].dt.date.unique(), reverse=True)
-days.insert(0, 'All')
+days = ['All'] + index.days
 
 # Category filter
 selected_category = st.sidebar.selectbox("Select a category", categories)
@@ -113,6 +112,9 @@ selected_day = st.sidebar.selectbox("Select a day", days)
 price_range = st.sidebar.slider("Select a price range", min_value=df['price'].min(), max_value=df['price'].max(), value=(df['price'].min(), df['price'].max()))
 
 
+# The per-day rollups can serve the charts when the price range is not narrowed
+price_filter = None if price_range == (df['price'].min(), df['price'].max()) else price_range
+
 # Date range slider
 date_range = st.sidebar.date_input("Select a date range", value=(df['datetime'].min().date(), df['datetime'].max().date()))
 
@@ -123,7 +125,7 @@ if st.sidebar.button("Reset Dates"):
     selected_day = 'All'
 
 # Show available dates popup
-available_dates = sorted(df['datetime'].dt.date.unique(), reverse=True)
+available_dates = index.days
 available_date_range = f"{min(available_dates)} to {max(available_dates)}"
 st.sidebar.text(f"ℹ️ Available Dates: {available_date_range}")
 
@@ -132,45 +134,36 @@ if (date_range[0] not in available_dates) or (date_range[1] not in available_dat
     st.warning(f"No data available for the selected date range.\n ℹ️ Available Dates: {available_date_range}.")
     st.stop()
 
-# Filter data based on the selected category, date range, and price range
-if selected_category == 'All records':
-    # If 'All' is selected for category, filter by the selected date range and display all records
-    if selected_day == 'All':
-        filtered_data = df[(df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])]
-    else:
-        # If a specific day is chosen, filter by that day and the selected date range
-        filtered_data = df[(df["datetime"].dt.date == selected_day) & (df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])]
-elif selected_category == 'Unique Products':
-    # If 'All' is selected for category, display only unique ASINs without date filtering
-    if selected_day == 'All':
-        filtered_data = df[(df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])].drop_duplicates(subset='asin')
-    else:
-        # If 'All' is selected for category but a specific day is chosen, filter by that day and the selected date range
-        filtered_data = df[(df["datetime"].dt.date == selected_day) & (df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])]
+# Filter data based on the selected category, day and date range
+if selected_category == 'Unique Products' and selected_day == 'All':
+    # Display the latest state of every ASIN seen in the date range
+    filtered_data = source.unique_products(source_key, date_range)
+    if filtered_data.empty:
+        st.warning("No unique products stored yet: run scripts/products.py to build them (see the README).")
+        st.stop()
 else:
-    # Display data for the selected category, specific day, and date range, including duplicates
-    if selected_day == 'All':
-        filtered_data = df[(df["category"] == selected_category) & (df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])]
-    else:
-        filtered_data = df[(df["category"] == selected_category) & (df["datetime"].dt.date == selected_day) & (df['datetime'].dt.date >= date_range[0]) & (df['datetime'].dt.date <= date_range[1])]
-
-
-
-
+    # 'All records' and 'Unique Products' on a specific day include every category, duplicates included
+    filtered_data = index.filter(selected_category, selected_day, date_range)
+    if filtered_data.empty:
+        st.warning(f"No {selected_category} records for the selected day and date range.")
+        st.stop()
 
 total_records = len(filtered_data)
 # Display total records in the sidebar as small blue text
 st.sidebar.markdown(f'<div style="color: #33C5FF; font-size: 12px;">Selected Records: {total_records}</div>', unsafe_allow_html=True)
 
-# KPIs
+# KPIs (num_reviews is a nullable integer: as float64 the mean of no values is NaN instead of pd.NA)
 avg_price = filtered_data["price"].mean()
 avg_rating = filtered_data["rating"].mean()
-avg_reviews = filtered_data["num_reviews"].mean()
+avg_reviews = filtered_data["num_reviews"].astype('float64').mean()
 
 # THE TITLE
 st.title(f"AmazonTracker")
 st.write(f"#### Category: {selected_category.capitalize()}")
 
+# Keep the selected date for the query layer
+selected_day_date = selected_day
+
 # Convert selected_day to pd.Timestamp if it's not 'All Records'
 if selected_day != 'All':
     selected_day = pd.to_datetime(selected_day)
@@ -180,14 +173,10 @@ df_last_24h_selected_date = pd.DataFrame()
 
 # Filter data for all records 24 hours ago, considering the category
 if selected_day != 'All':
-    df_last_24h_selected_date = df[
-        (df['datetime'] >= (selected_day - pd.DateOffset(hours=24))) &
-        (df['datetime'] < selected_day) &
-        ((df['category'] == selected_category) | (selected_category == 'All records') | (selected_category == 'Unique Products'))
-    ]
+    df_last_24h_selected_date = index.select(index.time_slice(selected_day - pd.DateOffset(hours=24), selected_day), selected_category)
 else:
     # Handle the case when 'All Records' is selected as the category and 'All' is selected as the date
-    df_last_24h_all_records = df[df['datetime'] >= (pd.to_datetime(df['datetime'].max()) - pd.DateOffset(hours=24))]
+    df_last_24h_all_records = index.df.iloc[index.time_slice(pd.to_datetime(df['datetime'].max()) - pd.DateOffset(hours=24))]
     if selected_category == 'All records':
         avg_price_24h_all_records = df_last_24h_all_records['price'].mean()
     elif selected_category == 'Unique Products':
@@ -199,7 +188,7 @@ else:
 # Continue with calculating other metrics as needed
 avg_price_24h_ago = df_last_24h_selected_date['price'].mean() if selected_day != 'All' else avg_price_24h_all_records
 avg_rating_24h_ago = df_last_24h_selected_date['rating'].mean() if selected_day != 'All' else df_last_24h_all_records['rating'].mean()
-avg_reviews_24h_ago = df_last_24h_selected_date['num_reviews'].mean() if selected_day != 'All' else df_last_24h_all_records['num_reviews'].mean()
+avg_reviews_24h_ago = df_last_24h_selected_date['num_reviews'].astype('float64').mean() if selected_day != 'All' else df_last_24h_all_records['num_reviews'].astype('float64').mean()
 
 # Calculate the percentage changes for each metric in the last 24 hours leading up to the selected date
 delta_avg_price = round(((avg_price - avg_price_24h_ago) / max(avg_price_24h_ago, 1)) * 100, 2) if avg_price_24h_ago > 0 and selected_day != 'All' else None
@@ -237,219 +226,213 @@ with metric3:
         delta=f"{delta_avg_reviews:.2f}% (24h)" if delta_avg_reviews is not None else None
     )
 
-# Calculate the range of prices for the filtered data
-filtered_price_range = filtered_data["price"].max() - filtered_data["price"].min()
-
-# Calculate the number of bins such that each bin represents $1 for the filtered data
-filtered_num_bins = int(filtered_price_range) + 1
-
-# Apply the price filter to filtered_data
-filtered_data = filtered_data[(filtered_data['price'] >= price_range[0]) & (filtered_data['price'] <= price_range[1])]
-
-fig_filtered_price_distribution = px.histogram(
-    filtered_data, 
-    x="price", 
-    nbins=filtered_num_bins,
-    title=f"Price Distribution for {selected_category} on {selected_day}",
-    range_x=[0, 300]  # Set the x-axis range from 0 to 200
-)
-# Set the width to 900
-fig_filtered_price_distribution.update_layout(width=900, height=600)
-st.plotly_chart(fig_filtered_price_distribution)
-
-
-# Calculate average price per category based on the filtered data
-avg_price_per_category = filtered_data.groupby("category")["price"].mean().sort_values(ascending=False).reset_index()
-
-fig_bar = px.bar(
-    avg_price_per_category, 
-    x="price", 
-    y="category", 
-    color="category",  # Set color based on the "category" column
-    orientation='h', 
-    title="Average Price per Category",
-    range_x=[0, 300],
-    text="price",  # Display the average price as text labels
-    height=700
-)
-fig_bar.update_traces(texttemplate='%{text:.2f}€', textposition='outside')  # Format the text labels
-# Set the width to 900
-fig_bar.update_layout(width=900)
-
-st.plotly_chart(fig_bar)
-
-
-# Filter out data points with a rating of 0
-filtered_data_scatter = filtered_data[filtered_data['price'] > 0]
+# Calculate the database size for each hour
+database_size_hourly = source.hourly_unique_asins(source_key)
 
-# Scatter plot for price vs. rating
-fig_scatter = px.scatter(
-    filtered_data_scatter,
-    x='price',
-    y='rating',
-    color='category',
-    title='Price vs. Rating',
-    labels={'price': 'Price', 'rating': 'Rating'},
-    hover_data=['title'],  # Display product title on hover
+# Line chart for database size progression
+fig_database_size_hourly = px.line(
+    database_size_hourly,
+    x='datetime',
+    y='database_size',
+    title='Database Size Progression (Hourly)',
+    labels={'datetime': 'Date', 'database_size': 'Database Size'},
 )
 
-# Set y-axis range from 0 to 5
-fig_scatter.update_layout(yaxis=dict(range=[0, 5.1]))
-
-# Set the width to 900
-fig_scatter.update_layout(width=900, height=700)
+# Set the width and height in the sidebar
+fig_database_size_hourly.update_layout(width=300, height=300)
 
-# Display the plot in Streamlit app
-st.plotly_chart(fig_scatter)
+# Display the database size progression line chart in the sidebar
+st.sidebar.plotly_chart(fig_database_size_hourly)
 
-# Calculate the range of ratings for the filtered data
-filtered_rating_range = filtered_data["rating"].max() - filtered_data["rating"].min()
 
-# Calculate the number of bins such that each bin represents one rating for the filtered data
-filtered_num_bins_rating = int(filtered_rating_range) + 1
+# Charts are split into tabs that only run when opened, and each tab's figures are cached per filter state
+# (index.version changes whenever the frame is refreshed)
+@st.cache_data(ttl=REFRESH_TTL, max_entries=32)
+def distribution_figures(_filtered_data, source_key, version, selected_category, selected_day, date_range, price_range):
+    filtered_data = _filtered_data
+    figures = []
 
-# Apply the rating filter to filtered_data
-filtered_data = filtered_data[(filtered_data['rating'] > 0)]  # Filter out data points with a rating of 0
+    # Calculate the range of prices for the filtered data
+    filtered_price_range = filtered_data["price"].max() - filtered_data["price"].min()
 
-# Create a histogram for the rating distribution with bins of size 0.1
-fig_filtered_rating_distribution = px.histogram(
-    filtered_data, 
-    x="rating", 
-    nbins=50,  # Set the number of bins to represent 0.1 increments
-    title=f"Rating Distribution for {selected_category} on {selected_day}",
-    range_x=[0, 5.5]  # Set the x-axis range from 0 to 5
-)
-# Set the width to 900
-fig_filtered_rating_distribution.update_layout(width=900, height=600)
-st.plotly_chart(fig_filtered_rating_distribution)
+    # Calculate the number of bins such that each bin represents $1 for the filtered data
+    filtered_num_bins = int(filtered_price_range) + 1
 
+    # Apply the price filter to filtered_data
+    filtered_data = filtered_data[(filtered_data['price'] >= price_range[0]) & (filtered_data['price'] <= price_range[1])]
 
+    # Exact histogram for small selections, binned server-side (1€ bins) for large ones
+    fig_filtered_price_distribution = histogram(
+        filtered_data,
+        "price",
+        nbins=filtered_num_bins,
+        bin_size=1,
+        title=f"Price Distribution for {selected_category} on {selected_day}",
+        range_x=[0, 300]  # Set the x-axis range from 0 to 300
+    )
+    # Set the width to 900
+    fig_filtered_price_distribution.update_layout(width=900, height=600)
+    figures.append(fig_filtered_price_distribution)
+
+    # Calculate average price per category based on the filters
+    avg_price_per_category = source.category_avg_prices(source_key, selected_category, selected_day, date_range, price_range)
+
+    fig_bar = px.bar(
+        avg_price_per_category,
+        x="price",
+        y="category",
+        color="category",  # Set color based on the "category" column
+        orientation='h',
+        title="Average Price per Category",
+        range_x=[0, 300],
+        text="price",  # Display the average price as text labels
+        height=700
+    )
+    fig_bar.update_traces(texttemplate='%{text:.2f}€', textposition='outside')  # Format the text labels
+    # Set the width to 900
+    fig_bar.update_layout(width=900)
+
+    figures.append(fig_bar)
+
+    # Filter out data points with a rating of 0
+    filtered_data_scatter = filtered_data[filtered_data['price'] > 0]
+
+    # Scatter plot for price vs. rating (WebGL over a sample of the points for large selections);
+    # titles are only loaded for the hover text of the points drawn
+    fig_scatter = scatter(
+        filtered_data_scatter,
+        lambda: source.titles(source_key),
+        title='Price vs. Rating',
+        labels={'price': 'Price', 'rating': 'Rating'},
+    )
 
+    # Set y-axis range from 0 to 5
+    fig_scatter.update_layout(yaxis=dict(range=[0, 5.1]))
 
-# Reviews Over Time (Line chart)
-filtered_reviews_data = df.copy()
+    # Set the width to 900
+    fig_scatter.update_layout(width=900, height=700)
 
-# Apply filters to the data
-if selected_category != 'All records':
-    filtered_reviews_data = filtered_reviews_data[filtered_reviews_data["category"] == selected_category]
+    figures.append(fig_scatter)
 
-filtered_reviews_data = filtered_reviews_data[(filtered_reviews_data['datetime'].dt.date >= date_range[0]) & (filtered_reviews_data['datetime'].dt.date <= date_range[1])]
-filtered_reviews_data = filtered_reviews_data[(filtered_reviews_data['price'] >= price_range[0]) & (filtered_reviews_data['price'] <= price_range[1])]
+    # Calculate the range of ratings for the filtered data
+    filtered_rating_range = filtered_data["rating"].max() - filtered_data["rating"].min()
 
-fig_reviews_over_time = px.line(
-    filtered_reviews_data.groupby(filtered_reviews_data['datetime'].dt.date)["num_reviews"].sum().reset_index(),
-    x="datetime", y="num_reviews",
-    title="Reviews Over Time",
-    labels={'datetime': 'Date', 'num_reviews': 'Number of Reviews'},
-)
+    # Calculate the number of bins such that each bin represents one rating for the filtered data
+    filtered_num_bins_rating = int(filtered_rating_range) + 1
 
-# Set the width to 900
-fig_reviews_over_time.update_layout(width=900, height=500)
-st.plotly_chart(fig_reviews_over_time)  
+    # Apply the rating filter to filtered_data
+    filtered_data = filtered_data[(filtered_data['rating'] > 0)]  # Filter out data points with a rating of 0
 
+    # Create a histogram for the rating distribution with bins of size 0.1
+    fig_filtered_rating_distribution = histogram(
+        filtered_data,
+        "rating",
+        nbins=50,  # Set the number of bins to represent 0.1 increments
+        bin_size=0.1,
+        title=f"Rating Distribution for {selected_category} on {selected_day}",
+        range_x=[0, 5.5]  # Set the x-axis range from 0 to 5
+    )
+    # Set the width to 900
+    fig_filtered_rating_distribution.update_layout(width=900, height=600)
+    figures.append(fig_filtered_rating_distribution)
 
+    return figures
 
-# Calculate the database size for each hour
-database_size_hourly = df.groupby(df['datetime'].dt.floor('H'))['asin'].nunique().cumsum().reset_index()
-database_size_hourly.columns = ['datetime', 'database_size']
 
-# Line chart for database size progression
-fig_database_size_hourly = px.line(
-    database_size_hourly,
-    x='datetime',
-    y='database_size',
-    title='Database Size Progression (Hourly)',
-    labels={'datetime': 'Date', 'database_size': 'Database Size'},
-)
-
-# Set the width and height in the sidebar
-fig_database_size_hourly.update_layout(width=300, height=300)
+@st.cache_data(ttl=REFRESH_TTL, max_entries=32)
+def trend_figures(source_key, version, selected_category, date_range, price_filter):
+    figures = []
 
-# Display the database size progression line chart in the sidebar
-st.sidebar.plotly_chart(fig_database_size_hourly)
+    # Count, sum and mean of reviews, ratings and prices per category per day in one aggregation,
+    # shared by Reviews Over Time and the animated category charts
+    category_stats = source.category_daily_stats(source_key, date_range, price_filter)
 
-# Filter data for reviews
-filtered_reviews_data = df.copy()
-
-# Apply filters to the data
-filtered_reviews_data = filtered_reviews_data[(filtered_reviews_data['datetime'].dt.date >= date_range[0]) & (filtered_reviews_data['datetime'].dt.date <= date_range[1])]
-filtered_reviews_data = filtered_reviews_data[(filtered_reviews_data['price'] >= price_range[0]) & (filtered_reviews_data['price'] <= price_range[1])]
-
-# Calculate average reviews per category per day
-avg_reviews_per_category_per_day = filtered_reviews_data.groupby(['category', filtered_reviews_data['datetime'].dt.date])['num_reviews'].mean().reset_index()
-
-# Bar chart for average reviews animated per day
-fig_avg_reviews_per_category = px.bar(
-    avg_reviews_per_category_per_day,
-    x='category',
-    y='num_reviews',
-    animation_frame='datetime',
-    title='Average Reviews per Category (Animated)',
-    labels={'num_reviews': 'Average Reviews'},
-    range_y=[0, 80000],
-)
+    # Reviews Over Time (Line chart)
+    fig_reviews_over_time = px.line(
+        daily_totals(category_stats, selected_category, 'num_reviews'),
+        x="datetime", y="num_reviews",
+        title="Reviews Over Time",
+        labels={'datetime': 'Date', 'num_reviews': 'Number of Reviews'},
+    )
 
-# Set the width to 900
-fig_avg_reviews_per_category.update_layout(width=900)
+    # Set the width to 900
+    fig_reviews_over_time.update_layout(width=900, height=500)
+    figures.append(fig_reviews_over_time)
+
+    # Calculate average reviews per category per day
+    avg_reviews_per_category_per_day = category_stats[['category', 'datetime', 'num_reviews', 'unique_asins']]
+
+    # Bar chart for average reviews animated per day
+    fig_avg_reviews_per_category = px.bar(
+        avg_reviews_per_category_per_day,
+        x='category',
+        y='num_reviews',
+        animation_frame='datetime',
+        title='Average Reviews per Category (Animated)',
+        labels={'num_reviews': 'Average Reviews', 'unique_asins': 'Products'},
+        hover_data=['unique_asins'],  # Distinct ASINs behind each average
+        range_y=[0, 80000],
+    )
 
-# Display the animated bar chart in the main area
-st.plotly_chart(fig_avg_reviews_per_category)
+    # Set the width to 900
+    fig_avg_reviews_per_category.update_layout(width=900)
 
-# Filter data for ratings
-filtered_ratings_data = df.copy()
+    figures.append(fig_avg_reviews_per_category)
 
-# Apply filters to the data
-filtered_ratings_data = filtered_ratings_data[(filtered_ratings_data['datetime'].dt.date >= date_range[0]) & (filtered_ratings_data['datetime'].dt.date <= date_range[1])]
-filtered_ratings_data = filtered_ratings_data[(filtered_ratings_data['price'] >= price_range[0]) & (filtered_ratings_data['price'] <= price_range[1])]
+    # Calculate average ratings per category per day
+    avg_ratings_per_category_per_day = category_stats[['category', 'datetime', 'rating', 'unique_asins']]
 
-# Calculate average ratings per category per day
-avg_ratings_per_category_per_day = filtered_ratings_data.groupby(['category', filtered_ratings_data['datetime'].dt.date])['rating'].mean().reset_index()
+    # Bar chart for average ratings animated per day
+    fig_avg_ratings_per_category = px.bar(
+        avg_ratings_per_category_per_day,
+        x='category',
+        y='rating',
+        animation_frame='datetime',
+        title='Average Ratings per Category (Animated)',
+        labels={'rating': 'Average Ratings', 'unique_asins': 'Products'},
+        hover_data=['unique_asins'],  # Distinct ASINs behind each average
+        range_y=[0, 5.1],
+    )
 
-# Bar chart for average ratings animated per day
-fig_avg_ratings_per_category = px.bar(
-    avg_ratings_per_category_per_day,
-    x='category',
-    y='rating',
-    animation_frame='datetime',
-    title='Average Ratings per Category (Animated)',
-    labels={'rating': 'Average Ratings'},
-    range_y=[0, 5.1],
-)
+    # Set the width to 900
+    fig_avg_ratings_per_category.update_layout(width=900)
 
-# Set the width to 900
-fig_avg_ratings_per_category.update_layout(width=900)
+    figures.append(fig_avg_ratings_per_category)
 
-# Display the animated bar chart in the main area
-st.plotly_chart(fig_avg_ratings_per_category)
+    # Calculate average prices per category per day
+    avg_prices_per_category_per_day = category_stats[['category', 'datetime', 'price', 'unique_asins']]
 
+    # Bar chart for average prices animated per day with fixed Y-axis range
+    fig_avg_prices_per_category = px.bar(
+        avg_prices_per_category_per_day,
+        x='category',
+        y='price',
+        animation_frame='datetime',
+        title='Average Prices per Category (Animated)',
+        labels={'price': 'Average Prices', 'unique_asins': 'Products'},
+        hover_data=['unique_asins'],  # Distinct ASINs behind each average
+        range_y=[0, 300],  # Fix Y-axis range to 0-300
+    )
 
+    # Set the width to 900
+    fig_avg_prices_per_category.update_layout(width=900)
 
-# Filter data for prices
-filtered_prices_data = df.copy()
+    figures.append(fig_avg_prices_per_category)
 
-# Apply filters to the data
-filtered_prices_data = filtered_prices_data[(filtered_prices_data['datetime'].dt.date >= date_range[0]) & (filtered_prices_data['datetime'].dt.date <= date_range[1])]
-filtered_prices_data = filtered_prices_data[(filtered_prices_data['price'] >= price_range[0]) & (filtered_prices_data['price'] <= price_range[1])]
+    return figures
 
-# Calculate average prices per category per day
-avg_prices_per_category_per_day = filtered_prices_data.groupby(['category', filtered_prices_data['datetime'].dt.date])['price'].mean().reset_index()
 
-# Bar chart for average prices animated per day with fixed Y-axis range
-fig_avg_prices_per_category = px.bar(
-    avg_prices_per_category_per_day,
-    x='category',
-    y='price',
-    animation_frame='datetime',
-    title='Average Prices per Category (Animated)',
-    labels={'price': 'Average Prices'},
-    range_y=[0, 300],  # Fix Y-axis range to 0-300
-)
+distributions_tab, trends_tab = st.tabs(['Distributions 📊', 'Trends 📈'], key='section', on_change='rerun')
 
-# Set the width to 900
-fig_avg_prices_per_category.update_layout(width=900)
+with distributions_tab:
+    if distributions_tab.open:
+        for fig in distribution_figures(filtered_data, source_key, index.version, selected_category, selected_day_date, date_range, price_range):
+            st.plotly_chart(fig)
 
-# Display the animated bar chart in the main area
-st.plotly_chart(fig_avg_prices_per_category)
+with trends_tab:
+    if trends_tab.open:
+        for fig in trend_figures(source_key, index.version, selected_category, date_range, price_filter):
+            st.plotly_chart(fig)
 
 # Add a centered text below the chart with smaller size and 50% opacity
 st.sidebar.markdown("<h5 style='text-align: center; opacity: 0.5;'>Made by Borja SG</h5>", unsafe_allow_html=True)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Chart builders that keep the browser payload bounded: up to LARGE_DATA_ROWS rows the figures are
+# built from the raw rows as before; above it histograms are binned here with NumPy (only the bin counts
+# are sent) and the scatter is drawn with WebGL from a per-category sample of at most MAX_SCATTER_POINTS.
+# Either way a histogram has at most MAX_HISTOGRAM_BINS bars
+
+LARGE_DATA_ROWS = 20000
+MAX_SCATTER_POINTS = 5000
+MAX_HISTOGRAM_BINS = 500
+SAMPLE_SEED = 0  # Same sample on every rerun for the same filters
+
+
+def is_large(df):
+    return len(df) > LARGE_DATA_ROWS
+
+
+def histogram(df, column, nbins, bin_size, title, range_x):
+    # nbins is plotly's hint for the exact (client-side) histogram, bin_size the width of the server-side bins
+    if not is_large(df):
+        return px.histogram(df, x=column, nbins=min(nbins, MAX_HISTOGRAM_BINS), title=title, range_x=range_x)
+
+    values = df[column].dropna().to_numpy(dtype='float64')
+    # Only the visible range is binned, so a single outlier does not stretch the bins to it
+    values = values[(values >= range_x[0]) & (values <= range_x[1])]
+    if len(values):
+        # Wider bins when the range still holds more than MAX_HISTOGRAM_BINS of them
+        bin_size = bin_size * max(1, np.ceil((values.max() - values.min()) / bin_size / MAX_HISTOGRAM_BINS))
+        start = np.floor(values.min() / bin_size) * bin_size
+        edges = np.arange(start, values.max() + bin_size, bin_size)
+        if len(edges) < 2:
+            edges = np.array([start, start + bin_size])
+        counts, edges = np.histogram(values, bins=edges)
+    else:
+        counts, edges = np.array([], dtype='int64'), np.array([0.0])
+    bins = pd.DataFrame({column: edges[:-1] + bin_size / 2, 'count': counts})
+    fig = px.bar(bins, x=column, y='count', title=title, range_x=range_x)
+    fig.update_traces(width=bin_size)
+    fig.update_layout(bargap=0)
+    return fig
+
+
+def sample_points(df, max_points=None):
+    # Same fraction from every category, so small categories keep their share of the points
+    max_points = max_points or MAX_SCATTER_POINTS
+    if len(df) <= max_points:
+        return df
+    fraction = max_points / len(df)
+    return df.groupby('category', observed=True, group_keys=False).sample(frac=fraction, random_state=SAMPLE_SEED)
+
+
+def scatter(df, titles, title, labels):
+    # titles: callable returning the ASIN -> title mapping, only looked up for the points that are drawn
+    large = is_large(df)
+    points = sample_points(df) if large else df
+    if 'title' not in points:
+        points = points.assign(title=points['asin'].astype(str).map(titles()))
+    if large:
+        title = f'{title} (sample of {len(points):,} of {len(df):,} points)'
+    return px.scatter(
+        points,
+        x='price',
+        y='rating',
+        color='category',
+        title=title,
+        labels=labels,
+        hover_data=['title'],  # Display product title on hover
+        render_mode='webgl' if large else 'auto',
+    )
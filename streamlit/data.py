@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import timedelta
+import pandas as pd
+import streamlit as st
+from pymongo import MongoClient
+
+# Data layer for the dashboard: one shared client and an in-memory copy of the collection
+# that only pulls documents newer than the last seen 'datetime' on each refresh
+
+DATABASE_NAME = "amazontracker"
+COLLECTION_NAME = "scrape_collection"
+ROLLUPS_COLLECTION_NAME = "daily_rollups"  # Maintained by the scraper, see scripts/rollups.py
+PRODUCTS_COLLECTION_NAME = "products"  # Latest state per ASIN, see scripts/products.py
+HISTORY_COLLECTION_NAME = "price_history"  # Change-only observations, see scripts/price_history.py
+REFRESH_TTL = 300  # Seconds between incremental refreshes
+# Records are stamped on the scraper hosts before they are written, so one stamped earlier can land after
+# a later one has already moved the watermark; each refresh reads this far back again
+REFRESH_MARGIN = timedelta(minutes=15)
+
+# Only the fields the dashboard frame uses; titles are looked up per ASIN when a chart needs them
+FRAME_PROJECTION = {'datetime': 1, 'category': 1, 'asin': 1, 'rank': 1, 'price': 1, 'rating': 1, 'num_reviews': 1}
+CATEGORICAL_COLUMNS = ('category', 'asin')
+
+# Per (category, day) statistics shared by the animated category charts and Reviews Over Time
+STAT_METRICS = ('num_reviews', 'rating', 'price')
+STATS_COLUMNS = ['category', 'datetime'] + [f'{metric}_{stat}' for metric in STAT_METRICS for stat in ('count', 'sum')] + \
+    ['unique_asins']
+
+
+@st.cache_resource
+def get_client(mongo_uri):
+    return MongoClient(mongo_uri)
+
+
+def get_collection(mongo_uri, collection_name=COLLECTION_NAME):
+    return get_client(mongo_uri)[DATABASE_NAME][collection_name]
+
+
+class DataStore:
+    def __init__(self):
+        self.df = None
+        self.watermark = None
+        self.recent_ids = {}  # _id -> datetime of the loaded records within the margin before the watermark
+        self.last_refresh = 0
+        self.lock = threading.Lock()
+
+
+@st.cache_resource
+def get_store(mongo_uri):
+    # Shared by every session and rerun
+    return DataStore()
+
+
+def prepare(df):
+    # Records are typed at scrape time; only documents that predate the migration need coercion
+    for column in ('price', 'rating', 'num_reviews'):
+        if column in df and df[column].dtype == object:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+        df['datetime'] = pd.to_datetime(df['datetime'])
+    return df
+
+
+def compact(df):
+    # Repeated strings as categoricals and small numbers in narrow types
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    if 'rating' in df:
+        df['rating'] = df['rating'].astype('float32')
+    if 'rank' in df:
+        df['rank'] = pd.to_numeric(df['rank'], errors='coerce').astype('Int16')
+    if 'num_reviews' in df:
+        df['num_reviews'] = pd.to_numeric(df['num_reviews'], errors='coerce').astype('Int32')
+    return df
+
+
+def append_frames(df, new_df):
+    # Concatenating categoricals with different categories would fall back to object columns
+    # (assign instead of in-place updates: other sessions may be reading the stored frame)
+    categories = {column: df[column].cat.categories.union(new_df[column].cat.categories) for column in CATEGORICAL_COLUMNS}
+    df = df.assign(**{column: df[column].cat.set_categories(categories[column]) for column in CATEGORICAL_COLUMNS})
+    new_df = new_df.assign(**{column: new_df[column].cat.set_categories(categories[column]) for column in CATEGORICAL_COLUMNS})
+    return pd.concat([df, new_df], ignore_index=True)
+
+
+def refresh(store, collection, margin=REFRESH_MARGIN):
+    # Only documents from the margin before the watermark on; the ones already loaded are dropped by _id
+    query = {'datetime': {'$gte': store.watermark - margin}} if store.watermark is not None else {}
+    new_docs = [doc for doc in collection.find(query, FRAME_PROJECTION) if doc['_id'] not in store.recent_ids]
+    print(f'{len(new_docs)} new records')
+    if not new_docs:
+        return
+
+    new_df = prepare(pd.DataFrame(new_docs))
+    watermark = new_df['datetime'].max().to_pydatetime()
+    if store.watermark is None or watermark > store.watermark:
+        store.watermark = watermark
+    cutoff = store.watermark - margin
+    store.recent_ids.update(zip(new_df['_id'], new_df['datetime']))
+    store.recent_ids = {_id: seen for _id, seen in store.recent_ids.items() if seen >= cutoff}
+
+    # The ObjectIds are only needed for the watermark bookkeeping above
+    new_df = compact(new_df.drop(columns='_id'))
+    store.df = new_df if store.df is None else append_frames(store.df, new_df)
+
+
+def load_data(mongo_uri, ttl=REFRESH_TTL):
+    store = get_store(mongo_uri)
+    with store.lock:
+        if store.df is None or time.time() - store.last_refresh > ttl:
+            refresh(store, get_collection(mongo_uri))
+            store.last_refresh = time.time()
+    return store.df
+
+
+def with_means(stats):
+    # Means from the sums and counts; a metric with no values on a day has no mean
+    for metric in STAT_METRICS:
+        count = stats[f'{metric}_count']
+        stats[metric] = stats[f'{metric}_sum'] / count.where(count > 0)
+    return stats
+
+
+def daily_totals(stats, category, metric):
+    # Sum of a metric per day for one category (or every category)
+    if category not in (None, 'All records', 'Unique Products'):
+        stats = stats[stats['category'] == category]
+    return stats.groupby('datetime')[f'{metric}_sum'].sum().rename(metric).reset_index()
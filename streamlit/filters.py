@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Filter engine for the dashboard frame: the frame is kept sorted by 'datetime' and its day keys are
+# computed once, so date and day filters are binary-search slices instead of per-row .dt.date masks.
+# Filtered views are memoized per filter combination, and the index is rebuilt only when the frame changes.
+
+MAX_VIEWS = 64  # Filter combinations kept per frame
+MAX_INDEXES = 2  # Frames indexed at once (the current one and the one being replaced)
+ALL_CATEGORIES = (None, 'All records', 'Unique Products')
+
+
+class FilterIndex:
+    def __init__(self, df):
+        if not df['datetime'].is_monotonic_increasing:
+            df = df.sort_values('datetime', kind='stable').reset_index(drop=True)
+        self.df = df
+        self.times = df['datetime'].to_numpy()
+        self.day_keys = self.times.astype('datetime64[D]')
+        self.days = sorted(pd.to_datetime(np.unique(self.day_keys)).date, reverse=True)
+        # Identifies the frame's contents in cache keys (the frame only grows between refreshes)
+        self.version = (len(df), str(self.times[-1]) if len(df) else None)
+        self.views = OrderedDict()
+        self.lock = threading.Lock()
+
+    def day_slice(self, start, end):
+        # Rows whose day is in [start, end]; day_keys is sorted along with the frame
+        lo = np.searchsorted(self.day_keys, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(self.day_keys, np.datetime64(end, 'D'), side='right')
+        return slice(lo, hi)
+
+    def time_slice(self, start=None, end=None):
+        # Rows with start <= datetime < end
+        lo = 0 if start is None else np.searchsorted(self.times, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = len(self.times) if end is None else np.searchsorted(self.times, pd.Timestamp(end).to_datetime64(), side='left')
+        return slice(lo, hi)
+
+    def select(self, rows, category=None, price_range=None):
+        view = self.df.iloc[rows]
+        mask = None
+        if category not in ALL_CATEGORIES:
+            mask = view['category'] == category
+        if price_range is not None:
+            price_mask = view['price'].between(price_range[0], price_range[1])
+            mask = price_mask if mask is None else mask & price_mask
+        return view if mask is None else view[mask]
+
+    def filter(self, category=None, day=None, date_range=None, price_range=None):
+        key = (category, day, tuple(date_range) if date_range is not None else None,
+               tuple(price_range) if price_range is not None else None)
+        with self.lock:
+            if key in self.views:
+                self.views.move_to_end(key)
+                return self.views[key]
+
+        start, end = date_range if date_range is not None else (self.days[-1], self.days[0])
+        if day not in (None, 'All'):
+            # A single day only matches if it lies inside the date range
+            start, end = max(start, day), min(end, day)
+        rows = self.day_slice(start, end) if start <= end else slice(0, 0)
+        view = self.select(rows, category, price_range)
+
+        with self.lock:
+            self.views[key] = view
+            if len(self.views) > MAX_VIEWS:
+                self.views.popitem(last=False)
+        return view
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(df):
+    # One index per frame object; a refresh produces a new frame and so a new index
+    with _indexes_lock:
+        entry = _indexes.get(id(df))
+        if entry is not None and entry[0] is df:
+            _indexes.move_to_end(id(df))
+            return entry[1]
+        index = FilterIndex(df)
+        _indexes[id(df)] = (df, index)
+        if len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+        return index
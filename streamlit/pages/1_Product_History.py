@@ -0,0 +1,56 @@
+import streamlit as st
+import plotly.express as px
+from sources import get_source
+
+st.set_page_config(
+    page_title='AmazonTracker - Product History',
+    page_icon='🔎'
+)
+
+# Data source: MongoDB (URI from secrets) or a local Parquet snapshot when SNAPSHOT_PATH is set
+source, source_key = get_source()
+
+st.title("Product History")
+
+asin = st.text_input("ASIN", placeholder="e.g. B08N5WRWNW").strip().upper()
+if not asin:
+    st.info("Enter an ASIN to see how its price, rating, reviews and rank changed over time.")
+    st.stop()
+
+latest = source.product(source_key, asin)
+if latest is None:
+    st.warning(f"No product found with ASIN {asin}.")
+    st.stop()
+
+st.write(f"#### {latest.get('title') or asin}")
+if latest.get('img_link'):
+    st.image(latest['img_link'], width=150)
+st.write(f"Categories: {', '.join(latest.get('categories', []))}")
+st.write(f"First seen: {latest['first_seen']} · Last seen: {latest['last_seen']}")
+
+# Latest values
+metric1, metric2, metric3, metric4 = st.columns(4)
+with metric1:
+    st.metric(label='Price 💲', value=f"€{latest['price']:.2f}" if latest.get('price') is not None else '-')
+with metric2:
+    st.metric(label='Rating ⭐', value=f"{latest['rating']:.1f}" if latest.get('rating') is not None else '-')
+with metric3:
+    st.metric(label='Reviews 📝', value=latest.get('num_reviews') if latest.get('num_reviews') is not None else '-')
+with metric4:
+    st.metric(label='Rank 🏆', value=latest.get('rank') if latest.get('rank') is not None else '-')
+
+history = source.product_history(source_key, asin)
+if history.empty:
+    st.warning("No history stored for this product yet.")
+    st.stop()
+
+# Values hold until the next stored change, so draw them as steps
+for column, label in [('price', 'Price'), ('rating', 'Rating'), ('num_reviews', 'Number of Reviews'), ('rank', 'Rank')]:
+    # Rank depends on the category listing, so it gets one line per category
+    color = 'category' if column == 'rank' and 'category' in history else None
+    fig = px.line(history, x='datetime', y=column, color=color, title=f'{label} Over Time',
+                  labels={'datetime': 'Date', column: label}, line_shape='hv', markers=True)
+    if column == 'rank':
+        fig.update_yaxes(autorange='reversed')  # Rank 1 at the top
+    fig.update_layout(width=900, height=400)
+    st.plotly_chart(fig)
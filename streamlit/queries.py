@@ -0,0 +1,188 @@
+from datetime import datetime, time, timedelta
+import pandas as pd
+import streamlit as st
+from data import load_data, get_collection, with_means, REFRESH_TTL, COLLECTION_NAME, ROLLUPS_COLLECTION_NAME, \
+    PRODUCTS_COLLECTION_NAME, HISTORY_COLLECTION_NAME, STAT_METRICS, STATS_COLUMNS
+
+# Query layer: group-bys run as MongoDB aggregation pipelines so only aggregated rows reach the app.
+# Without a price filter the daily series read the pre-aggregated rollups instead of the raw records
+
+# 'datetime' is stored as a BSON date
+DAY_KEY = {'$dateToString': {'format': '%Y-%m-%d', 'date': '$datetime'}}
+HOUR_KEY = {'$dateToString': {'format': '%Y-%m-%d %H', 'date': '$datetime'}}
+
+
+def day_start(day):
+    return datetime.combine(day, time.min)
+
+
+def build_match(category=None, day=None, date_range=None, price_range=None):
+    match = {}
+    if category not in (None, 'All records', 'Unique Products'):
+        match['category'] = category
+    datetime_bounds = {}
+    if date_range is not None:
+        datetime_bounds['$gte'] = day_start(date_range[0])
+        datetime_bounds['$lt'] = day_start(date_range[1] + timedelta(days=1))
+    if day not in (None, 'All'):
+        datetime_bounds['$gte'] = max(datetime_bounds.get('$gte', datetime.min), day_start(day))
+        day_end = day_start(day + timedelta(days=1))
+        datetime_bounds['$lt'] = min(datetime_bounds.get('$lt', day_end), day_end)
+    if datetime_bounds:
+        match['datetime'] = datetime_bounds
+    if price_range is not None:
+        match['price'] = {'$gte': float(price_range[0]), '$lte': float(price_range[1])}
+    return match
+
+
+def load_frame(mongo_uri):
+    return load_data(mongo_uri)
+
+
+def aggregate(mongo_uri, pipeline, collection_name=COLLECTION_NAME):
+    return pd.DataFrame(list(get_collection(mongo_uri, collection_name).aggregate(pipeline, allowDiskUse=True)))
+
+
+def build_rollup_match(category=None, date_range=None):
+    # Rollups are per (category, day), so only category and date filters apply to them
+    match = {}
+    if category not in (None, 'All records', 'Unique Products'):
+        match['category'] = category
+    if date_range is not None:
+        match['day'] = {'$gte': day_start(date_range[0]), '$lte': day_start(date_range[1])}
+    return match
+
+
+def build_products_match(date_range=None):
+    # Products seen at least once within the date range
+    if date_range is None:
+        return {}
+    return {
+        'last_seen': {'$gte': day_start(date_range[0])},
+        'first_seen': {'$lt': day_start(date_range[1] + timedelta(days=1))},
+    }
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def unique_products(mongo_uri, date_range):
+    # Latest state of every product seen in the date range, read from the products collection
+    docs = get_collection(mongo_uri, PRODUCTS_COLLECTION_NAME).find(
+        build_products_match(date_range),
+        {'_id': 0, 'asin': 1, 'category': 1, 'rank': 1, 'title': 1, 'price': 1, 'rating': 1, 'num_reviews': 1, 'last_seen': 1}
+    )
+    df = pd.DataFrame(list(docs))
+    if df.empty:
+        return pd.DataFrame(columns=['asin', 'category', 'rank', 'title', 'price', 'rating', 'num_reviews', 'datetime'])
+    return df.rename(columns={'last_seen': 'datetime'})
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def titles(mongo_uri):
+    # ASIN -> title, for hover text; one row per product instead of one per record
+    docs = get_collection(mongo_uri, PRODUCTS_COLLECTION_NAME).find({}, {'title': 1})
+    return {doc['_id']: doc.get('title') for doc in docs}
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def unique_product_count(mongo_uri):
+    return get_collection(mongo_uri, PRODUCTS_COLLECTION_NAME).estimated_document_count()
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def daily_counts(mongo_uri):
+    df = aggregate(mongo_uri, [
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$day'}}, 'count': {'$sum': '$count'}}},
+        {'$sort': {'_id': 1}},
+    ], ROLLUPS_COLLECTION_NAME)
+    if df.empty:
+        # Rollups not backfilled yet (see scripts/rollups.py)
+        return pd.DataFrame(columns=['datetime', 'count'])
+    df = df.rename(columns={'_id': 'datetime'})
+    df['datetime'] = pd.to_datetime(df['datetime']).dt.date
+    return df
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def hourly_unique_asins(mongo_uri):
+    df = aggregate(mongo_uri, [
+        {'$group': {'_id': {'hour': HOUR_KEY, 'asin': '$asin'}}},
+        {'$group': {'_id': '$_id.hour', 'unique_asins': {'$sum': 1}}},
+        {'$sort': {'_id': 1}},
+    ])
+    if df.empty:
+        return pd.DataFrame(columns=['datetime', 'database_size'])
+    df['datetime'] = pd.to_datetime(df['_id'], format='%Y-%m-%d %H')
+    df['database_size'] = df['unique_asins'].cumsum()
+    return df[['datetime', 'database_size']]
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def category_avg_prices(mongo_uri, category, day, date_range, price_range):
+    collection_name = COLLECTION_NAME
+    pipeline = [{'$match': build_match(category, day, date_range, price_range)}]
+    if category == 'Unique Products' and day == 'All':
+        # One row per ASIN with its latest price
+        collection_name = PRODUCTS_COLLECTION_NAME
+        pipeline = [{'$match': {**build_products_match(date_range), **build_match(price_range=price_range)}}]
+    pipeline += [
+        {'$group': {'_id': '$category', 'price': {'$avg': '$price'}}},
+        {'$sort': {'price': -1}},
+        {'$project': {'_id': 0, 'category': '$_id', 'price': 1}},
+    ]
+    df = aggregate(mongo_uri, pipeline, collection_name)
+    return df if not df.empty else pd.DataFrame(columns=['category', 'price'])
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def category_daily_stats(mongo_uri, date_range, price_range=None):
+    # Count, sum and mean of every metric (and the distinct ASINs) per category and day in a single pass; the category
+    # charts and Reviews Over Time all derive from this one result
+    if price_range is None:
+        # The rollups already hold the counts and sums
+        df = aggregate(mongo_uri, [
+            {'$match': build_rollup_match(date_range=date_range)},
+            {'$project': {'_id': 0, 'category': 1, 'datetime': '$day', **{column: 1 for column in STATS_COLUMNS[2:]}}},
+            {'$sort': {'category': 1, 'datetime': 1}},
+        ], ROLLUPS_COLLECTION_NAME)
+    else:
+        group = {'_id': {'category': '$category', 'day': DAY_KEY}}
+        for metric in STAT_METRICS:
+            # Missing and null values sort below numbers, so they are not counted
+            group[f'{metric}_count'] = {'$sum': {'$cond': [{'$gt': [f'${metric}', None]}, 1, 0]}}
+            group[f'{metric}_sum'] = {'$sum': f'${metric}'}
+        group['asins'] = {'$addToSet': '$asin'}
+        df = aggregate(mongo_uri, [
+            {'$match': build_match(date_range=date_range, price_range=price_range)},
+            {'$group': group},
+            {'$set': {'unique_asins': {'$size': '$asins'}}},
+            {'$project': {'asins': 0}},
+            {'$sort': {'_id.category': 1, '_id.day': 1}},
+        ])
+        if not df.empty:
+            df['category'] = df['_id'].str['category']
+            df['datetime'] = df['_id'].str['day']
+    if df.empty:
+        return with_means(pd.DataFrame(columns=STATS_COLUMNS))
+    df = df.reindex(columns=STATS_COLUMNS)
+    df['datetime'] = pd.to_datetime(df['datetime']).dt.date
+    df[STATS_COLUMNS[2:]] = df[STATS_COLUMNS[2:]].fillna(0)
+    return with_means(df)
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def product(mongo_uri, asin):
+    return get_collection(mongo_uri, PRODUCTS_COLLECTION_NAME).find_one({'_id': asin})
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def product_history(mongo_uri, asin):
+    # Rebuilds one product's series from its change-only observations (indexed by asin, datetime)
+    series = list(get_collection(mongo_uri, HISTORY_COLLECTION_NAME).find({'asin': asin}, {'_id': 0}).sort('datetime', 1))
+    df = pd.DataFrame(series)
+    if df.empty:
+        return pd.DataFrame(columns=['datetime', 'category', 'price', 'rating', 'num_reviews', 'rank'])
+    # Each value holds until the next change, so extend the last one to the latest sighting
+    latest = product(mongo_uri, asin)
+    if latest and latest.get('last_seen') and latest['last_seen'] > df['datetime'].iloc[-1]:
+        df = pd.concat([df, df.iloc[[-1]].assign(datetime=latest['last_seen'])], ignore_index=True)
+    return df
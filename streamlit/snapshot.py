@@ -0,0 +1,137 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import streamlit as st
+from data import REFRESH_TTL, STAT_METRICS, compact, with_means
+
+# Parquet snapshot source (see scripts/export_parquet.py): same functions as queries.py, computed with pandas
+# over only the columns and date partitions each one needs, so the dashboard can run without database access
+
+# Schema of the export plus the date partition key. Passing it to the dataset also reads snapshots exported with
+# dictionary-encoded ASINs and categories, whose index width differed from one day to the next
+SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('ms')),
+    ('category', pa.string()),
+    ('rank', pa.int16()),
+    ('asin', pa.string()),
+    ('title', pa.string()),
+    ('price', pa.float32()),
+    ('rating', pa.float32()),
+    ('num_reviews', pa.int32()),
+    ('img_link', pa.string()),
+    ('date', pa.string()),
+])
+
+
+def read_snapshot(path, columns, date_range=None, asin=None):
+    dataset = ds.dataset(path, format='parquet', partitioning='hive', schema=SCHEMA)
+    condition = None
+    if date_range is not None:
+        # Partition pruning: only the date=... directories inside the range are opened
+        condition = (ds.field('date') >= str(date_range[0])) & (ds.field('date') <= str(date_range[1]))
+    if asin is not None:
+        asin_condition = ds.field('asin') == asin
+        condition = asin_condition if condition is None else condition & asin_condition
+    return dataset.to_table(columns=list(columns), filter=condition).to_pandas()
+
+
+def filter_frame(df, category=None, day=None, price_range=None):
+    mask = pd.Series(True, index=df.index)
+    if category not in (None, 'All records', 'Unique Products'):
+        mask &= df['category'] == category
+    if day not in (None, 'All'):
+        mask &= df['datetime'].dt.date == day
+    if price_range is not None:
+        mask &= df['price'].between(price_range[0], price_range[1])
+    return df[mask]
+
+
+# Shared rather than copied per rerun (like the MongoDB frame), so the filter index built on it is reused
+@st.cache_resource(ttl=REFRESH_TTL)
+def load_frame(path):
+    df = read_snapshot(path, ['datetime', 'category', 'asin', 'rank', 'price', 'rating', 'num_reviews'])
+    # Widgets such as the price slider expect float64 prices
+    df['price'] = df['price'].astype('float64')
+    return compact(df)
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def titles(path):
+    df = read_snapshot(path, ['datetime', 'asin', 'title'])
+    df = df.sort_values('datetime').drop_duplicates(subset='asin', keep='last')
+    return dict(zip(df['asin'].astype(str), df['title']))
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def unique_products(path, date_range):
+    df = read_snapshot(path, ['datetime', 'asin', 'category', 'rank', 'title', 'price', 'rating', 'num_reviews'], date_range)
+    # Latest sighting of every ASIN in the date range
+    return df.sort_values('datetime').drop_duplicates(subset='asin', keep='last').reset_index(drop=True)
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def unique_product_count(path):
+    return read_snapshot(path, ['asin'])['asin'].nunique()
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def daily_counts(path):
+    df = read_snapshot(path, ['datetime'])
+    return df.groupby(df['datetime'].dt.date).size().reset_index(name='count')
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def hourly_unique_asins(path):
+    df = read_snapshot(path, ['datetime', 'asin'])
+    database_size_hourly = df.groupby(df['datetime'].dt.floor('h'))['asin'].nunique().cumsum().reset_index()
+    database_size_hourly.columns = ['datetime', 'database_size']
+    return database_size_hourly
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def category_avg_prices(path, category, day, date_range, price_range):
+    if category == 'Unique Products' and day == 'All':
+        df = unique_products(path, date_range)
+    else:
+        df = read_snapshot(path, ['datetime', 'category', 'price'], date_range)
+    df = filter_frame(df, category, day if category != 'Unique Products' or day != 'All' else None, price_range)
+    return df.groupby('category', observed=True)['price'].mean().sort_values(ascending=False).reset_index()
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def category_daily_stats(path, date_range, price_range=None):
+    df = filter_frame(read_snapshot(path, ['datetime', 'category', 'asin', 'price', 'rating', 'num_reviews'], date_range),
+                      price_range=price_range)
+    aggregations = {}
+    for metric in STAT_METRICS:
+        aggregations[f'{metric}_count'] = (metric, 'count')
+        aggregations[f'{metric}_sum'] = (metric, 'sum')
+    aggregations['unique_asins'] = ('asin', 'nunique')
+    stats = df.groupby(['category', df['datetime'].dt.date], observed=True).agg(**aggregations).reset_index()
+    stats['category'] = stats['category'].astype(str)
+    return with_means(stats)
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def product(path, asin):
+    df = read_snapshot(path, ['datetime', 'asin', 'category', 'rank', 'title', 'price', 'rating', 'num_reviews', 'img_link'],
+                       asin=asin)
+    if df.empty:
+        return None
+    df = df.sort_values('datetime')
+    latest = df.iloc[-1]
+    # Plain Python values, like the document the products collection returns
+    latest = {field: None if pd.isna(value) else getattr(value, 'item', lambda: value)() for field, value in latest.items()}
+    return {
+        **{field: latest[field] for field in ('asin', 'category', 'rank', 'title', 'price', 'rating', 'num_reviews', 'img_link')},
+        'first_seen': df['datetime'].iloc[0],
+        'last_seen': df['datetime'].iloc[-1],
+        'categories': sorted(df['category'].astype(str).unique()),
+    }
+
+
+@st.cache_data(ttl=REFRESH_TTL)
+def product_history(path, asin):
+    # The snapshot keeps every sighting, so the series is simply all rows of the ASIN
+    df = read_snapshot(path, ['datetime', 'category', 'price', 'rating', 'num_reviews', 'rank'], asin=asin)
+    return df.sort_values('datetime').reset_index(drop=True)
@@ -0,0 +1,21 @@
+import os
+import streamlit as st
+
+# Picks where the dashboard reads from: a local Parquet snapshot when SNAPSHOT_PATH is set, MongoDB otherwise.
+# Both modules expose the same query functions, taking the snapshot path or the Mongo URI as first argument
+
+
+def secret(name):
+    try:
+        return st.secrets.get(name)
+    except Exception:  # No secrets file, e.g. running against a local snapshot
+        return None
+
+
+def get_source():
+    snapshot_path = os.getenv('SNAPSHOT_PATH') or secret('SNAPSHOT_PATH')
+    if snapshot_path:
+        import snapshot
+        return snapshot, snapshot_path
+    import queries
+    return queries, st.secrets['MONGO_URI']